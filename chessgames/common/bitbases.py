@@ -0,0 +1,292 @@
+"""
+Win/draw bitbases of the endings against a lone king (KQK, KRK, KPK and KBNK). They are built by
+retrograde analysis (`build_table`, run by `manage.py build_bitbases`) and probed through
+memory-mapped files (`Bitbases`, see `Game.probe_endgame`).
+
+Positions are stored with the side that has the extra pieces (the "strong" side) playing white, so the
+pawn of KPK always moves up the board. Positions where black is the strong side are mirrored top to
+bottom before probing. Only the strong side can win these endings, so one bit per position is enough:
+set if the strong side wins with best play. If it is clear, the game is a draw (or the position is
+illegal).
+
+Squares are bitboard bits (0 is 'a1', 63 is 'h8', see `BitBoard`). The bit of a position is at
+`position_index`: side to move (0: strong side, 1: weak side), then the squares of the strong king,
+the weak king and the other pieces of the strong side (in the order of the table name), 6 bits each
+"""
+import itertools
+import mmap
+import os
+from collections import deque
+from threading import Lock
+
+from chessgames.common.chessengine import BitBoard
+
+# (table name, letters of the strong side's pieces other than its king), in build order: a table may
+# need the ones before it (KPK needs the tables its pawn promotes into)
+TABLES = (
+    ('KQK', 'Q'),
+    ('KRK', 'R'),
+    ('KPK', 'P'),
+    ('KBNK', 'BN'),
+)
+PIECES = dict(TABLES)
+# Order of the pieces in the table names
+PIECE_ORDER = 'QRBNP'
+EXTENSION = '.bb'
+
+KING_ATTACKS = BitBoard.KING_ATTACKS
+KNIGHT_ATTACKS = BitBoard.KNIGHT_ATTACKS
+PAWN_ATTACKS = BitBoard.PAWN_ATTACKS[0]
+# Bits of the squares next to each square
+KING_SQUARES = tuple(tuple(target for target in range(64) if KING_ATTACKS[square] >> target & 1)
+                     for square in range(64))
+
+
+def table_name(letters):
+    """
+    :param letters: Letters of the strong side's pieces other than its king, in any order
+    :return: Name of the table of that material (which may not be one of `TABLES`)
+    """
+    return 'K' + ''.join(sorted(letters, key=PIECE_ORDER.index)) + 'K'
+
+
+def table_size(name):
+    """
+    :return: Size in bytes of the file of table `name`
+    """
+    return 2 << 6 * (len(PIECES[name]) + 2) >> 3
+
+
+def position_index(strong_to_move, squares):
+    """
+    :param strong_to_move: Whether the strong side is to move
+    :param squares: Bits of the strong king, the weak king and the other pieces of the strong side, with
+    the strong side playing white
+    :return: Index of the position's bit in its table
+    """
+    index = 0 if strong_to_move else 1
+    for square in squares:
+        index = index << 6 | square
+    return index
+
+
+def attacks(letter, square, occupied):
+    """
+    :return: Bitboard of the squares attacked by a white piece (`letter`) on `square`
+    """
+    if letter == 'N':
+        return KNIGHT_ATTACKS[square]
+    if letter == 'P':
+        return PAWN_ATTACKS[square]
+    attacked = 0
+    if letter in 'QB':
+        attacked = BitBoard._slider_attacks(square, occupied, BitBoard.DIAGONAL_RAYS_UP,
+                                            BitBoard.DIAGONAL_RAYS_DOWN)
+    if letter in 'QR':
+        attacked |= BitBoard._slider_attacks(square, occupied, BitBoard.ORTHOGONAL_RAYS_UP,
+                                             BitBoard.ORTHOGONAL_RAYS_DOWN)
+    return attacked
+
+
+def build_table(name, tables=None):
+    """
+    Retrograde analysis of table `name`. Checkmates are found first; then wins are propagated
+    backwards, unmaking moves: a position with the strong side to move is won as soon as one of its
+    moves reaches a won position, and one with the weak side to move once all of its moves do (captures
+    of a strong piece never do, since none of these endings is won after one)
+    :param tables: { [name]: bytes } with the tables already built. Needed by KPK, whose pawn may
+    promote
+    :return: The table (`bytes`, see `position_index`)
+    """
+    letters = PIECES[name]
+    count = len(letters) + 2
+    size = 2 << 6 * count
+    weak = size >> 1
+    # Promotions: [(table of the promoted material, index of the pawn in its squares)]
+    promotions = []
+    if 'P' in letters:
+        for letter in 'QR':
+            promoted = letters.replace('P', letter)
+            promotions.append((tables[table_name(promoted)],
+                               table_name(promoted).index(letter) + 1))
+    won = bytearray(size)
+    valid = bytearray(size)
+    # Legal moves of the weak side not yet known to lose
+    moves = bytearray(weak)
+    queue = deque()
+
+    def attacked(target, pieces, occupied):
+        for letter, square in zip(letters, pieces):
+            if square != target and attacks(letter, square, occupied) >> target & 1:
+                return True
+        return False
+
+    for index, squares in enumerate(itertools.product(range(64), repeat=count)):
+        strong_king, weak_king = squares[0], squares[1]
+        pieces = squares[2:]
+        if len(set(squares)) < count or KING_ATTACKS[strong_king] >> weak_king & 1 or \
+                any(letter == 'P' and not 8 <= square < 56 for letter, square in zip(letters, pieces)):
+            continue
+        occupied = 0
+        for square in squares:
+            occupied |= 1 << square
+        # Weak side to move
+        valid[weak | index] = 1
+        legal = 0
+        for target in KING_SQUARES[weak_king]:
+            if target != strong_king and not KING_ATTACKS[strong_king] >> target & 1 and \
+                    not attacked(target, pieces, occupied & ~(1 << weak_king)):
+                legal += 1
+        check = attacked(weak_king, pieces, occupied)
+        moves[index] = legal
+        if not legal and check:
+            won[weak | index] = 1
+            queue.append(weak | index)
+        # Strong side to move: the weak king cannot be in check
+        if check:
+            continue
+        valid[index] = 1
+        for position, letter in enumerate(letters, 2):
+            square = squares[position]
+            if letter == 'P' and square >= 48 and not occupied >> square + 8 & 1:
+                for table, slot in promotions:
+                    promoted = list(squares)
+                    del promoted[position]
+                    promoted.insert(slot, square + 8)
+                    bit = position_index(False, promoted)
+                    if table[bit >> 3] >> (bit & 7) & 1 and not won[index]:
+                        won[index] = 1
+                        queue.append(index)
+
+    shift = 6 * (count - 1)
+    while queue:
+        index = queue.popleft()
+        squares = [index >> 6 * (count - 1 - position) & 63 for position in range(count)]
+        occupied = 0
+        for square in squares:
+            occupied |= 1 << square
+        if index & weak:
+            # Lost by the weak side: every strong move leading here wins
+            base = index ^ weak
+            predecessors = []
+            strong_king, weak_king = squares[0], squares[1]
+            for source in KING_SQUARES[strong_king]:
+                if not occupied >> source & 1:
+                    predecessors.append(base ^ (strong_king ^ source) << shift)
+            for position, letter in enumerate(letters, 2):
+                square = squares[position]
+                offset = 6 * (count - 1 - position)
+                if letter == 'P':
+                    sources = []
+                    if square >= 16 and not occupied >> square - 8 & 1:
+                        sources.append(square - 8)
+                        if 24 <= square < 32 and not occupied >> square - 16 & 1:
+                            sources.append(square - 16)
+                else:
+                    targets = attacks(letter, square, occupied) & ~occupied
+                    sources = []
+                    while targets:
+                        sources.append((targets & -targets).bit_length() - 1)
+                        targets &= targets - 1
+                for source in sources:
+                    predecessors.append(base ^ (square ^ source) << offset)
+            for predecessor in predecessors:
+                if valid[predecessor] and not won[predecessor]:
+                    won[predecessor] = 1
+                    queue.append(predecessor)
+        else:
+            # Won by the strong side: one less escape for the weak side in the positions before it
+            weak_king = squares[1]
+            offset = shift - 6
+            for source in KING_SQUARES[weak_king]:
+                if not occupied >> source & 1:
+                    predecessor = weak | index ^ (weak_king ^ source) << offset
+                    if valid[predecessor] and not won[predecessor]:
+                        moves[predecessor ^ weak] -= 1
+                        if not moves[predecessor ^ weak]:
+                            won[predecessor] = 1
+                            queue.append(predecessor)
+
+    packed = bytearray(size >> 3)
+    for index in range(0, size, 8):
+        byte = 0
+        for bit in range(8):
+            if won[index + bit]:
+                byte |= 1 << bit
+        packed[index >> 3] = byte
+    return bytes(packed)
+
+
+def build(directory, names=None, progress=None):
+    """
+    Builds tables (and the ones they need) and writes them to `directory`, replacing existing files
+    :param names: Names of the tables to build. By default, all of `TABLES`
+    :param progress: Function called with the name and contents of each table once it is written
+    """
+    names = set(PIECES if names is None else names)
+    for name, letters in TABLES:
+        if 'P' in letters and name in names:
+            names.update(table_name(letters.replace('P', letter)) for letter in 'QR')
+    os.makedirs(directory, exist_ok=True)
+    tables = {}
+    for name, letters in TABLES:
+        if name not in names:
+            continue
+        tables[name] = build_table(name, tables)
+        path = os.path.join(directory, name + EXTENSION)
+        with open(path + '.tmp', 'wb') as tablefile:
+            tablefile.write(tables[name])
+        os.replace(path + '.tmp', path)
+        if progress is not None:
+            progress(name, tables[name])
+
+
+class Bitbases:
+    """
+    Read-only access to the tables written by `build` to a directory. A table file is memory-mapped the
+    first time it is probed, so nothing is read up front and the pages are shared by every process of
+    the server. Tables missing then (or of the wrong size) are not looked for again
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.__tables = {}  # { [name]: mmap, or None if the table is missing }
+        self.__lock = Lock()
+
+    def table(self, name):
+        """
+        :return: The table `name` (a read-only `mmap`), or None if it is not available
+        """
+        try:
+            return self.__tables[name]
+        except KeyError:
+            pass
+        with self.__lock:
+            if name not in self.__tables:
+                self.__tables[name] = self.__open(name)
+            return self.__tables[name]
+
+    def __open(self, name):
+        if name not in PIECES:
+            return None
+        try:
+            with open(os.path.join(self.directory, name + EXTENSION), 'rb') as tablefile:
+                if os.fstat(tablefile.fileno()).st_size != table_size(name):
+                    return None
+                return mmap.mmap(tablefile.fileno(), 0, access=mmap.ACCESS_READ)
+        except OSError:
+            return None
+
+    def probe(self, name, strong_to_move, squares):
+        """
+        :param name: Table name (see `table_name`)
+        :param strong_to_move: Whether the strong side is to move
+        :param squares: See `position_index`
+        :return: True if the strong side wins, False if the position is a draw, or None if the table is
+        not available
+        """
+        table = self.table(name)
+        if table is None:
+            return None
+        index = position_index(strong_to_move, squares)
+        return bool(table[index >> 3] >> (index & 7) & 1)
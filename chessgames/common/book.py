@@ -0,0 +1,183 @@
+"""
+Opening book compiled from the stored games (`manage.py build_book`) into a file of fixed-width records
+sorted by position, probed by binary search through `mmap` (`OpeningBook`). It backs the opening
+explorer (`views.opening_explorer`) and gives the bot its first moves (see `search.best_move`).
+
+Positions are keyed by their Zobrist hash (`Game.hash`), so transpositions share their records. Each
+record holds one move played in the position, the number of games in which it was played, and how those
+of them that ended went for the player who made the move
+"""
+import mmap
+import os
+import random
+import struct
+from collections import namedtuple
+from threading import Lock
+
+from chessgames.common.chessengine import Game, packed_to_uci
+
+MAGIC = b'WXBOOK\x00\x01'
+# Position hash, packed move (see `pack_move`), games, wins, draws and losses
+RECORD = struct.Struct('<QHIIII')
+KEY = struct.Struct('<Q')
+
+"""
+- move: Move string (see `Game.make`)
+- weight: Games in which the move was played in the position
+- wins, draws, losses: Results of those games (the finished ones), for the player who made the move
+"""
+BookMove = namedtuple('BookMove', 'move weight wins draws losses')
+
+# Index of the player to move (0: white, 1: black) in the results of `compile_book`
+RESULT_INDEX = {'white': 0, 'black': 1, 'draw': 2}
+
+
+def compile_book(games, max_ply=20):
+    """
+    Replays the first `max_ply` moves of each game, counting the moves played in every position. A game
+    is cut at its first illegal move
+    :param games: Iterable of tuples (history, result), with history and result as in `ChessGame.history`
+    and `ChessGame.win` ('white', 'black', 'draw', or '' if the game has not ended)
+    :return: { [(position hash, packed move)]: [games, wins, draws, losses] }
+    """
+    entries = {}
+    for history, result in games:
+        game = Game.default_game(backend='bitboard')
+        result = RESULT_INDEX.get(result)
+        for ply, movestr in enumerate(history[:max_ply]):
+            try:
+                code = game.pack(movestr)
+            except ValueError:
+                break
+            counts = entries.setdefault((game.hash(), code), [0, 0, 0, 0])
+            counts[0] += 1
+            if result == 2:
+                counts[2] += 1
+            elif result is not None:
+                # Result of the game for the player who made the move
+                counts[1 if result == ply % 2 else 3] += 1
+            game.make_unchecked(code)
+    return entries
+
+
+def write_book(entries, path, min_games=1):
+    """
+    Writes the records of `compile_book` played in at least `min_games` games to `path`, replacing the
+    file atomically
+    :return: Number of records written
+    """
+    records = sorted((key, -counts[0], code, counts) for (key, code), counts in entries.items()
+                     if counts[0] >= min_games)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + '.tmp', 'wb') as bookfile:
+        bookfile.write(MAGIC)
+        for key, weight, code, counts in records:
+            bookfile.write(RECORD.pack(key, code, *counts))
+    os.replace(path + '.tmp', path)
+    return len(records)
+
+
+class OpeningBook:
+    """
+    Read-only access to a book file written by `write_book`. The file is memory-mapped, so the pages are
+    shared by every process of the server. Each lookup stats the file and maps it again if it was
+    replaced (say, by `manage.py build_book` on a running server) or created since. A missing (or
+    invalid) file is an empty book
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # (version of the file (see `__version`), mmap or None, number of records), replaced as a whole
+        # so that a lookup never mixes two files
+        self.__state = (None, None, 0)
+        self.__lock = Lock()
+
+    @staticmethod
+    def __version(stat):
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def __current(self):
+        """
+        :return: `__state` of the file as it is now on disk
+        """
+        try:
+            version = self.__version(os.stat(self.path))
+        except OSError:
+            version = None
+        state = self.__state
+        if version == state[0]:
+            return state
+        with self.__lock:
+            if version != self.__state[0]:
+                self.__state = self.__open(version)
+            return self.__state
+
+    def __open(self, version):
+        """
+        :return: `__state` of the file. Mappings of older files are left for the garbage collector, as
+        a lookup may still be reading them
+        """
+        bookmap = None
+        try:
+            with open(self.path, 'rb') as bookfile:
+                stat = os.fstat(bookfile.fileno())
+                version = self.__version(stat)
+                if stat.st_size > len(MAGIC) and (stat.st_size - len(MAGIC)) % RECORD.size == 0:
+                    bookmap = mmap.mmap(bookfile.fileno(), 0, access=mmap.ACCESS_READ)
+        except OSError:
+            pass
+        if bookmap is None or bookmap[:len(MAGIC)] != MAGIC:
+            return version, None, 0
+        return version, bookmap, (len(bookmap) - len(MAGIC)) // RECORD.size
+
+    def lookup(self, key):
+        """
+        :param key: Position hash (see `Game.hash`)
+        :return: List of `BookMove` of the position, the most played first (empty if the position is not
+        in the book)
+        """
+        version, bookmap, records = self.__current()
+        low, high = 0, records
+        while low < high:
+            middle = (low + high) // 2
+            if KEY.unpack_from(bookmap, len(MAGIC) + middle * RECORD.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        moves = []
+        for offset in range(len(MAGIC) + low * RECORD.size, len(MAGIC) + records * RECORD.size,
+                            RECORD.size):
+            record = RECORD.unpack_from(bookmap, offset)
+            if record[0] != key:
+                break
+            moves.append(BookMove(packed_to_uci(record[1]), *record[2:]))
+        return moves
+
+
+__books = {}
+__books_lock = Lock()
+
+
+def open_book(path):
+    """
+    :return: The `OpeningBook` of `path`, shared by every caller in this process
+    """
+    with __books_lock:
+        if path not in __books:
+            __books[path] = OpeningBook(path)
+        return __books[path]
+
+
+def choose(moves):
+    """
+    :param moves: List of `BookMove`
+    :return: Move string of one of `moves`, picked at random in proportion to their weights
+    """
+    pick = random.uniform(0, sum(move.weight for move in moves))
+    for move in moves:
+        pick -= move.weight
+        if pick <= 0:
+            break
+    return move.move
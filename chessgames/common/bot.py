@@ -0,0 +1,138 @@
+"""
+Computer opponent. The bot is a regular `User` (`settings.CHESS_BOT_USERNAME`) seated in a `ChessGame`.
+Its moves are searched in a process pool (see `chessgames.common.search`), never on a consumer's
+thread, and are played the same way as a human's: saved to the `ChessGame` and announced with
+`GroupMsgs.g_move`
+"""
+import time
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from threading import Lock, Thread
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+
+from chessgames.common.chessengine import Game
+from chessgames.common.group_msgs import GroupMsgs, group_send
+from chessgames.common.move_timer import run_timer
+from chessgames.common.search import best_move
+from chessgames.models import ChessGame
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_executor():
+    """
+    :return: The process pool shared by every bot game of this process (created on first use, with
+    `settings.CHESS_BOT_WORKERS` processes)
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=settings.CHESS_BOT_WORKERS)
+        return _executor
+
+
+def get_bot_user():
+    """
+    :return: The bot's `User`, created (inactive, without a usable password) on first use
+    """
+    user, created = User.objects.get_or_create(username=settings.CHESS_BOT_USERNAME,
+                                               defaults={'is_active': False})
+    if created:
+        user.set_unusable_password()
+        user.save()
+    return user
+
+
+def is_bot(user):
+    """
+    :param user: A `User` or None
+    """
+    return user is not None and user.username == settings.CHESS_BOT_USERNAME
+
+
+def request_bot_move(game_id, fen, history):
+    """
+    Starts searching the bot's move in the background. The search has `settings.CHESS_BOT_MOVE_SECONDS`
+    from now, time spent waiting for a free worker included
+    :param fen: The current position (ChessGame.fen)
+    :param history: The game's moves (ChessGame.history). The bot's move is dropped if more moves are
+    played meanwhile
+    """
+    deadline = time.time() + settings.CHESS_BOT_MOVE_SECONDS
+    future = get_executor().submit(best_move, fen, list(history), deadline,
+                                   book=settings.CHESS_BOOK_PATH)
+    future.add_done_callback(partial(__on_bot_move, game_id, len(history)))
+
+
+def __on_bot_move(game_id, move_count, future):
+    """
+    Runs on the pool's callback thread, which every bot game shares: the move is played on a thread of
+    its own, as `move_timer` does
+    """
+    try:
+        move = future.result()
+    except Exception:
+        return  # The bot loses on time (see move_timer)
+    if move is not None:
+        Thread(target=__play_bot_move, args=(game_id, move_count, move)).start()
+
+
+def __play_bot_move(game_id, move_count, move):
+    try:
+        __save_bot_move(game_id, move_count, move)
+    finally:
+        # This thread's connection is not managed by Django's request cycle
+        connection.close()
+
+
+def __save_bot_move(game_id, move_count, move):
+    try:
+        game = ChessGame.objects.get(pk=game_id)
+    except ChessGame.DoesNotExist:
+        return
+    if game.end is not None or len(game.history) != move_count:
+        return
+
+    if game.fen:
+        engine = Game.from_fen(game.fen, backend='bitboard')
+        engine.restore_repetitions(game.history)
+    else:
+        engine = Game.default_game(backend='bitboard')
+        engine.replay(game.history)
+    engine.make(move)
+    game.history.append(move)
+    game.fen = engine.to_fen()
+
+    me = 'white' if is_bot(game.white) else 'black'
+    status = engine.status()
+    draw_by_rule = settings.CHESS_AUTO_DRAW and (engine.is_threefold() or engine.is_fifty_move())
+    endgame = engine.probe_endgame() if settings.CHESS_ADJUDICATE_ENDGAMES else None
+    ended = status.checkmate or status.stalemate or engine.insufficient_material() or draw_by_rule or \
+        endgame is not None
+    if ended:
+        if status.checkmate or endgame == 'loss':
+            game.win = me
+        elif endgame == 'win':
+            game.win = 'black' if me == 'white' else 'white'
+        else:
+            game.win = 'draw'
+        game.end = datetime.now()
+        game.alive = False
+
+    # Only if the game has not ended nor moved on since it was read (e.g. ended by move_timer)
+    updated = ChessGame.objects.filter(pk=game_id, end__isnull=True, history__len=move_count).update(
+        history=game.history, fen=game.fen, win=game.win, end=game.end, alive=game.alive)
+    if not updated:
+        return
+    # `update` does not send post_save (see models.chessgame_model_changed)
+    group_send(game_id, GroupMsgs.g_model_changed())
+    group_send(game_id, GroupMsgs.g_move(move=move, draw_requested=False))
+    if ended:
+        group_send(game_id, GroupMsgs.g_game_end(winner=game.win, out_of_time=False))
+    else:
+        run_timer(game_id, move_count=len(game.history), winning_player=me)
@@ -1,6 +1,14 @@
+import os
+import sys
+from array import array
+from collections import OrderedDict
 from collections import deque
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
+from random import Random
+from threading import Lock, local
+from time import perf_counter
 
 
 class Side(Enum):
@@ -10,6 +18,10 @@ class Side(Enum):
     WHITE = 0
     BLACK = 1
 
+    # Os membros são únicos, então o hash pode ser o da identidade (o de `Enum` é calculado em Python,
+    # e `Side` é chave de muitos dicionários da engine)
+    __hash__ = object.__hash__
+
     def opponent(self):
         if self is Side.WHITE:
             return Side.BLACK
@@ -72,6 +84,7 @@ class Square(object):
         - rank: Ranque da casa (de 1 a 8)
 
     """
+    __slots__ = ('name', 'index', 'rank', 'valid')
     __index2valid = generate_non_sentinel()
     __instance_cache = {}
     __name2index = generate_name2index()
@@ -92,8 +105,9 @@ class Square(object):
          sqd1 = Square(sqb1 + 2)
          ```
         """
-        if cls.__instance_cache.get(descriptor) is not None:
-            return cls.__instance_cache[descriptor]
+        obj = cls.__instance_cache.get(descriptor)
+        if obj is not None:
+            return obj
         obj = object.__new__(cls)
         if isinstance(descriptor, int):
             index = descriptor
@@ -183,6 +197,15 @@ class Square(object):
         return '<Square(' + self.name + ')>'
 
 
+"""
+Tabelas indexadas pelo índice da casa (de 0 a 224): a instância de `Square`, o ranque e a validade de
+cada casa. Permitem que os laços internos da engine trabalhem com ints, sem chamar o construtor de `Square`
+"""
+INDEX_SQUARES = tuple(Square(index) for index in range(225))
+INDEX_RANKS = tuple(square.rank for square in INDEX_SQUARES)
+INDEX_VALID = tuple(square.valid for square in INDEX_SQUARES)
+
+
 class BoardLike:
     """
     Uma representação de um tabuleiro "generalizado", com 225 casas (15 por 15).
@@ -216,9 +239,9 @@ class BoardLike:
         :param item: Uma instância de `Square`, ou um int (índice da casa), ou uma string (nome da casa)
         :return: Elemento guardado em `BoardLike[item]`
         """
-        if isinstance(item, int):
+        if item.__class__ is int:
             return self._board[item]
-        if isinstance(item, Square):
+        if item.__class__ is Square:
             return self._board[item.index]
         return self._board[Square(item).index]
 
@@ -244,20 +267,41 @@ class Board(BoardLike):
     que estão em cada casa
     """
 
-    def __init__(self, datalist):
+    def __init__(self, datalist, evaltables=None):
+        """
+
+        :param datalist: Ver `BoardLike`
+        :param evaltables: Instância de `EvalTables` da avaliação estática (ver `evaluation`). Por
+        padrão, `EVAL_TABLES`
+        """
         super().__init__(datalist)
-        # { [side: Side]: {[key: Square]: bool?} }
+        # { [side: Side]: {[key: índice da casa]: bool?} }
         self.__playersquares = {
             Side.WHITE: {},
             Side.BLACK: {}
         }
         # Quadrados dos reis
         self.__kings = {Side.WHITE: None, Side.BLACK: None}
+        # Hash Zobrist das peças (ver `zobrist`)
+        self._zobrist = 0
         for sq, piece in enumerate(self._board):
-            if Square(sq).valid and piece.side is not None:
-                self.__playersquares[piece.side][Square(sq)] = True
+            if INDEX_VALID[sq] and piece.side is not None:
+                self.__playersquares[piece.side][sq] = True
+                self._zobrist ^= ZOBRIST_PIECES[piece][sq]
                 if piece.kind is King:
-                    self.__kings[piece.side] = Square(sq)
+                    self.__kings[piece.side] = INDEX_SQUARES[sq]
+        self.set_evaltables(EVAL_TABLES if evaltables is None else evaltables)
+
+    @staticmethod
+    def _index(square):
+        """
+        Converte `square` (instância de `Square`, int ou string) para o índice da casa
+        """
+        if square.__class__ is Square:
+            return square.index
+        if square.__class__ is int:
+            return square
+        return Square(square).index
 
     def occuppied(self, side):
         """
@@ -268,7 +312,7 @@ class Board(BoardLike):
         # Explicitly convert to list. Using an iterator led to bug:
         # I suspect doing and undoing moves in self.moves changed the order of the
         # keys in the iterator midway
-        return list(self.__playersquares[side].keys())
+        return [INDEX_SQUARES[index] for index in self.__playersquares[side]]
 
     def attacked(self, square, side):
         """
@@ -278,12 +322,108 @@ class Board(BoardLike):
         :return: Se existe uma peça do jogador que tenha linha de ataque para a casa `side`.
         Analisa somente pseudo-legalidade, isto é, inclui movimentos que, se fossem executados,
         deixariam o rei do jogador `side` em xeque
+
+        A busca parte de `square`: percorre os 8 raios e as casas de onde um cavalo, rei ou peão
+        atacaria `square` (tabelas pré-computadas em `generate_reverse_attack_tables`), examinando no
+        máximo umas 40 casas, por mais peças que o jogador tenha
         """
-        for fromsq in self.__playersquares[side]:
-            if self[fromsq].attacks(fromsq, square, self):
+        index = self._index(square)
+        board = self._board
+        pawn, knight, bishop, rook, queen, king = SIDE_PIECES[side]
+        for source in PAWN_SOURCES[side][index]:
+            if board[source] is pawn:
+                return True
+        for source in KNIGHT_SOURCES[index]:
+            if board[source] is knight:
                 return True
+        for source in KING_SOURCES[index]:
+            if board[source] is king:
+                return True
+        orthogonal, diagonal = SLIDER_RAYS[index]
+        for ray in orthogonal:
+            for source in ray:
+                piece = board[source]
+                if piece is not _NO_PIECE:
+                    if piece is rook or piece is queen:
+                        return True
+                    break
+        for ray in diagonal:
+            for source in ray:
+                piece = board[source]
+                if piece is not _NO_PIECE:
+                    if piece is bishop or piece is queen:
+                        return True
+                    break
         return False
 
+    def attackers(self, square, side):
+        """
+        Lista as peças do jogador `side` que atacam a casa `square` (pseudo-legalidade, como em
+        `attacked`), incluindo as que a atacam em "raio X" (ver `_attack_lines`), na ordem em que
+        capturariam numa troca: a menos valiosa primeiro, mas nunca antes das peças à sua frente na linha
+        (as do adversário são consideradas já fora dela)
+        :param square: Do tipo `Square`, ou um int (índice da casa), ou uma string (nome da casa)
+        :param side: Do tipo `Side`
+        :return: Lista com as `Square`s das peças atacantes
+        """
+        board = self._board
+        queues = [[source for source in line if board[source].side is side]
+                  for line in self._attack_lines(self._index(square))]
+        attackers = []
+        source = self._pop_attacker(queues, side)
+        while source is not None:
+            attackers.append(INDEX_SQUARES[source])
+            source = self._pop_attacker(queues, side)
+        return attackers
+
+    def _attack_lines(self, index, empty=()):
+        """
+        Procura, a partir da casa de índice `index`, as peças dos dois jogadores que a atacam, direta ou
+        indiretamente: em "raio X", atrás de outra peça que ataca a casa pela mesma linha (uma torre atrás
+        de outra, um bispo atrás de um peão...), que a atacaria quando a da frente saísse dela. Usa as
+        tabelas de `generate_reverse_attack_tables`
+        :param empty: Índices de casas tomadas como vazias
+        :return: Lista de filas (listas) de índices de casas de peças atacantes. Cada cavalo forma uma
+        fila; as outras peças, uma por raio que parte da casa, da mais próxima para a mais distante
+        """
+        board = self._board
+        lines = [[source] for source in KNIGHT_SOURCES[index] if board[source].kind is Knight
+                 and source not in empty]
+        orthogonal, diagonal = SLIDER_RAYS[index]
+        for rays, sliders in ((orthogonal, (Rook, Queen)), (diagonal, (Bishop, Queen))):
+            for ray in rays:
+                line = []
+                for source in ray:
+                    piece = board[source]
+                    if piece is _NO_PIECE or source in empty:
+                        continue
+                    kind = piece.kind
+                    if kind is sliders[0] or kind is sliders[1] or not line and source == ray[0] and \
+                            (kind is King or kind is Pawn and source in PAWN_SOURCES[piece.side][index]):
+                        line.append(source)
+                    else:
+                        break
+                if line:
+                    lines.append(line)
+        return lines
+
+    def _pop_attacker(self, queues, side):
+        """
+        Tira das filas de `_attack_lines` a peça menos valiosa do jogador `side` que está à frente de
+        sua fila
+        :return: O índice da casa da peça, ou None se nenhuma fila começa com uma peça de `side`
+        """
+        board = self._board
+        best = None
+        # Maior que a posição de qualquer tipo de peça em `ATTACKER_ORDER`
+        rank = len(ATTACKER_ORDER)
+        for queue in queues:
+            if queue:
+                piece = board[queue[0]]
+                if piece.side is side and ATTACKER_ORDER[piece.kind] < rank:
+                    best, rank = queue, ATTACKER_ORDER[piece.kind]
+        return None if best is None else best.pop(0)
+
     def _movepiece(self, fromsq, tosq):
         """
         Função protegida, fornecida somente em casos específicos para instâncias de `MoveExecutor`.
@@ -293,21 +433,29 @@ class Board(BoardLike):
         :param tosq: `Square` de destino da peça. `tosq` pode estar ocupado
         :return: `Piece` que estava posicionada em `tosq` antes da movimentação
         """
-        fromsq = Square(fromsq)
-        tosq = Square(tosq)
-        piece = self._board[fromsq.index]
-        oldpiece = self._board[tosq.index]
-        if oldpiece.kind is not NoPiece:
+        fromsq = self._index(fromsq)
+        tosq = self._index(tosq)
+        board = self._board
+        piece = board[fromsq]
+        oldpiece = board[tosq]
+        if oldpiece is not _NO_PIECE:
             self._removepiece(tosq)
         # tabuleiro
-        self._board[fromsq.index] = NoPiece()
-        self._board[tosq.index] = piece
+        board[fromsq] = _NO_PIECE
+        board[tosq] = piece
         # lista de quadrados do jogador
-        del self.__playersquares[piece.side][fromsq]
-        self.__playersquares[piece.side][tosq] = True
+        playersquares = self.__playersquares[piece.side]
+        del playersquares[fromsq]
+        playersquares[tosq] = True
         # lista de reis
         if piece.kind is King:
-            self.__kings[piece.side] = tosq
+            self.__kings[piece.side] = INDEX_SQUARES[tosq]
+        # hash
+        zobrist = ZOBRIST_PIECES[piece]
+        self._zobrist ^= zobrist[fromsq] ^ zobrist[tosq]
+        # avaliação
+        scores = self._evaltables.scores[piece]
+        self._score += scores[tosq] - scores[fromsq]
         return oldpiece
 
     def _addpiece(self, piece, square):
@@ -317,15 +465,18 @@ class Board(BoardLike):
         :param piece: Instância de `Piece` a ser adicionada ao tabuleiro
         :param square: Instância de `Square` (ou um int, ou uma string) onde adicionar a peça `piece`
         """
-        square = Square(square)
+        square = self._index(square)
         # tabuleiro
-        self._board[square.index] = piece
+        self._board[square] = piece
         # lista de quadrados do jogador
-        # print(piece, piece.side, square)
         self.__playersquares[piece.side][square] = True
         # lista de reis
         if piece.kind is King:
-            self.__kings[piece.side] = square
+            self.__kings[piece.side] = INDEX_SQUARES[square]
+        # hash
+        self._zobrist ^= ZOBRIST_PIECES[piece][square]
+        # avaliação
+        self._addtotals(piece, square)
 
     def _removepiece(self, square):
         """
@@ -333,18 +484,98 @@ class Board(BoardLike):
         :param square: Instância de `Square` (ou int, ou string) de onde retirar uma peça
         :return: Instância de `Piece` que estava em `square` antes de ser retirada
         """
-        square = Square(square)
-        piece = self._board[square.index]
-        side = piece.side
+        square = self._index(square)
+        piece = self._board[square]
         # tabuleiro
-        self._board[square.index] = NoPiece()
+        self._board[square] = _NO_PIECE
         # lista de quadrados do jogador
-        del self.__playersquares[side][square]
+        del self.__playersquares[piece.side][square]
         # lista de reis
         if piece.kind is King:
             self.__kings[piece.side] = None
+        # hash
+        self._zobrist ^= ZOBRIST_PIECES[piece][square]
+        # avaliação
+        self._removetotals(piece, square)
         return piece
 
+    def _addtotals(self, piece, index):
+        """
+        Soma a peça `piece`, posta na casa de índice `index`, à avaliação estática (ver `evaluation`) e
+        aos contadores de peças (ver `count`)
+        """
+        tables = self._evaltables
+        self._score += tables.scores[piece][index]
+        self._phase += tables.phase[piece]
+        self._material[piece.side.value] += tables.values[piece]
+        self._counts[piece] += 1
+        if piece.kind is Bishop:
+            self._bishopcolors[(index // 15 + index % 15) % 2] += 1
+
+    def _removetotals(self, piece, index):
+        """
+        Operação inversa de `_addtotals`
+        """
+        tables = self._evaltables
+        self._score -= tables.scores[piece][index]
+        self._phase -= tables.phase[piece]
+        self._material[piece.side.value] -= tables.values[piece]
+        self._counts[piece] -= 1
+        if piece.kind is Bishop:
+            self._bishopcolors[(index // 15 + index % 15) % 2] -= 1
+
+    def set_evaltables(self, evaltables):
+        """
+        Troca as tabelas da avaliação estática, recalculando-a do zero (e também os contadores de
+        peças)
+        :param evaltables: Instância de `EvalTables`
+        """
+        self._evaltables = evaltables
+        # Pontuações de meio-jogo e de final (ver `pack_score`), do ponto de vista das brancas
+        self._score = 0
+        self._phase = 0
+        self._material = [0, 0]
+        # { [peça (flyweight)]: quantas há no tabuleiro }
+        self._counts = {piece: 0 for pieces in SIDE_PIECES.values() for piece in pieces}
+        # Número de bispos (dos dois jogadores) em casas de cada cor
+        self._bishopcolors = [0, 0]
+        for index, piece in enumerate(self._board):
+            if INDEX_VALID[index] and piece.side is not None:
+                self._addtotals(piece, index)
+
+    def evaluation(self):
+        """
+        Avaliação estática da posição, mantida incrementalmente pelas funções protegidas que alteram o
+        tabuleiro (O(1)): soma dos valores e bônus peça-casa (ver `EvalTables`) das peças, com a pontuação
+        de meio-jogo e a de final ponderadas pela fase do jogo
+        :return: Avaliação em centipeões, do ponto de vista das brancas
+        """
+        middlegame, endgame = unpack_score(self._score)
+        maxphase = self._evaltables.maxphase
+        phase = min(self._phase, maxphase)
+        return (middlegame * phase + endgame * (maxphase - phase)) // maxphase
+
+    def material(self, side):
+        """
+        :param side: Do tipo `Side`
+        :return: Soma dos valores (ver `EvalTables`) das peças do jogador `side`, em centipeões
+        """
+        return self._material[side.value]
+
+    def count(self, piece):
+        """
+        Contadores de peças, mantidos incrementalmente pelas funções protegidas que alteram o tabuleiro
+        :param piece: Instância (flyweight) de uma peça, como `Knight(Side.WHITE)`
+        :return: Quantas peças `piece` há no tabuleiro
+        """
+        return self._counts[piece]
+
+    def bishopcolors(self):
+        """
+        :return: Tupla com o número de bispos (dos dois jogadores) em casas de cada uma das duas cores
+        """
+        return tuple(self._bishopcolors)
+
     def king(self, side):
         """
         Informa a casa do rei do jogador
@@ -353,6 +584,122 @@ class Board(BoardLike):
         """
         return self.__kings[side]
 
+    def pins_and_checkers(self, side):
+        """
+        Analisa as linhas de ataque ao rei do jogador `side`, para que movimentos legais possam ser
+        gerados sem executar cada movimento pseudolegal (ver `Game.moves`)
+        :param side: Do tipo `Side`
+        :return: Tupla com 3 elementos:
+            - Lista com os índices das casas das peças adversárias que dão xeque
+            - Conjunto com os índices das casas para onde uma peça que não seja o rei pode ir para
+            resolver um xeque simples (capturando a peça que dá xeque ou bloqueando seu ataque)
+            - Dicionário. Chave: índice da casa de uma peça cravada (que não pode sair da linha entre o
+            rei e a peça adversária que a crava). Valor: Conjunto com os índices das casas dessa linha
+        """
+        king = self._index(self.king(side))
+        enemy = side.opponent()
+        checkers = []
+        blocks = set()
+        pins = {}
+        for direction in Queen.directions:
+            slider = Rook if direction in Rook.directions else Bishop
+            ray = []
+            pinned = None
+            square = king + direction
+            while True:
+                piece = self._board[square]
+                if piece.kind is OutOfBoundsPiece:
+                    break
+                ray.append(square)
+                if piece.kind is NoPiece:
+                    square += direction
+                    continue
+                if piece.side is side:
+                    if pinned is not None:
+                        break
+                    pinned = square
+                    square += direction
+                    continue
+                if piece.kind is slider or piece.kind is Queen:
+                    if pinned is None:
+                        checkers.append(square)
+                        blocks.update(ray)
+                    else:
+                        pins[pinned] = set(ray)
+                break
+        pawn, knight = SIDE_PIECES[enemy][0:2]
+        for offset in Knight.offsets:
+            if self._board[king + offset] is knight:
+                checkers.append(king + offset)
+                blocks.add(king + offset)
+        for offset in Pawn.attackoffsets[enemy]:
+            if self._board[king - offset] is pawn:
+                checkers.append(king - offset)
+                blocks.add(king - offset)
+        return checkers, blocks, pins
+
+    def zobrist(self):
+        """
+        Hash Zobrist (inteiro de 64 bits) da disposição das peças no tabuleiro, mantido incrementalmente
+        pelas funções protegidas que alteram o tabuleiro. Não inclui direitos de roque, casa
+        "en passant" nem jogador da vez (ver `Game.hash`)
+        """
+        return self._zobrist
+
+    def copy(self):
+        """
+        Copia o tabuleiro sem refazer a varredura de `__init__`. Subclasses com estruturas próprias
+        devem sobrescrever este método
+        :return: Instância independente da mesma classe, com as mesmas peças
+        """
+        board = object.__new__(self.__class__)
+        board._board = self._board[:]
+        board.__playersquares = {side: dict(squares) for side, squares in self.__playersquares.items()}
+        board.__kings = dict(self.__kings)
+        board._zobrist = self._zobrist
+        board._copytotals(self)
+        return board
+
+    def _copytotals(self, other):
+        """
+        Copia a avaliação estática e os contadores de peças do tabuleiro `other` (ver `copy`)
+        """
+        self._evaltables = other._evaltables
+        self._score = other._score
+        self._phase = other._phase
+        self._material = other._material[:]
+        self._counts = dict(other._counts)
+        self._bishopcolors = other._bishopcolors[:]
+
+    def plmoves(self, square, context):
+        """
+        Lista os movimentos pseudolegais da peça que está em `square` (ver `Piece.plmoves`).
+
+        Backends de tabuleiro (como `BitBoard`) podem sobrescrever este método para gerar movimentos
+        com suas próprias estruturas de dados
+        :param square: Instância de `Square` (ou int, ou string) onde está a peça
+        :param context: Uma struct (namedtuple `Context`)
+        :return: Lista de movimentos pseudolegais da peça
+        """
+        return self[square].plmoves(square, self, context)
+
+    def plcodes(self, square, context):
+        """
+        Igual a `plmoves`, mas com os movimentos codificados em inteiros (ver `pack_move`)
+        """
+        to64 = BitBoard.TO64
+        frombit = to64[self._index(square)]
+        codes = []
+        for _, tosq, kind, promotion in self.plmoves(square, context):
+            if tosq.__class__ is not int:
+                tosq = self._index(tosq)
+            if promotion is None:
+                codes.append(frombit | to64[tosq] << 6 | PACKED_FLAGS[kind] << 12)
+            else:
+                codes.append(frombit | to64[tosq] << 6 |
+                             (PACKED_FLAGS[kind] | PACKED_PROMOTIONS.index(promotion.kind)) << 12)
+        return codes
+
 
 """
 Struct usada para armazenar informação contingente sobre o estado do tabuleiro.
@@ -520,6 +867,7 @@ class MovePromotionCaptureExecutor(MoveExecutor):
 
     def exec(self, move, movepiece, addpiece, removepiece):
         captured = movepiece(move.fromsq, move.tosq)
+        removepiece(move.tosq)
         addpiece(move.promotion, move.tosq)
         return AntiMove(
             move.tosq, move.fromsq, captured, move.tosq, MoveKind.ANTI_PROMOTION_CAPTURE)
@@ -533,7 +881,7 @@ class MoveAntiPromotionCaptureExecutor(MoveExecutor):
     def exec(self, move, movepiece, addpiece, removepiece):
         side = removepiece(move.fromsq).side
         addpiece(move.addpiece, move.addpos)
-        addpiece(Pawn(side), move.tosq)
+        addpiece(SIDE_PIECES[side][0], move.tosq)
 
 
 class MoveCastleKingExecutor(MoveExecutor):
@@ -599,9 +947,18 @@ class MoveKind(Enum):
     ANTI_CASTLE_KING = MoveAntiCastleKingExecutor()
     ANTI_CASTLE_QUEEN = MoveAntiCastleQueenExecutor()
 
+    # Membros são únicos, então o hash por identidade (em C) basta e é bem mais rápido que o de `Enum`,
+    # que calcula o hash do nome a cada consulta a um dicionário (como `PACKED_FLAGS`)
+    __hash__ = object.__hash__
+
     def exec(self, move, movepiece, addpiece, removepiece):
         """Delega ao `exec` de `MoveExecutor`"""
-        return self.value.exec(move, movepiece, addpiece, removepiece)
+        # `_value_` em vez de `value`, que é uma propriedade (em Python) de `Enum`
+        return self._value_.exec(move, movepiece, addpiece, removepiece)
+
+
+# Movimentos que capturam alguma peça
+CAPTURE_KINDS = frozenset((MoveKind.CAPTURE, MoveKind.EP_CAPTURE, MoveKind.PROMOTION_CAPTURE))
 
 
 class Piece(object):
@@ -611,12 +968,14 @@ class Piece(object):
     Atende à DP "flyweight": Existe somente uma instância para cada tipo de peça e lado do jogo. Isso
     significa, por exemplo, que todos os 8 peões brancos são somente 1 instância de `Rook` (subclasse)
     """
+    __slots__ = ('side', 'kind')
     __instance_cache = {}
 
     def __new__(cls, side, *args, **kwargs):
-        if cls.__instance_cache.get((cls, side)) is None:
-            cls.__instance_cache[(cls, side)] = object.__new__(cls)
-        return cls.__instance_cache[(cls, side)]
+        obj = cls.__instance_cache.get((cls, side))
+        if obj is None:
+            obj = cls.__instance_cache[(cls, side)] = object.__new__(cls)
+        return obj
 
     def __init__(self, side):
         self.side = side
@@ -652,6 +1011,7 @@ class NoPiece(Piece):
     Representa a ausência de peça. Por exemplo: Dada uma instância de `BoardLike`, acessar
     `BoardLike[Square('b1')]` retornará instância de `NoPiece` caso a casa 'b1' não esteja ocupada
     """
+    __slots__ = ()
 
     def __new__(cls, *args, **kwargs):
         return super().__new__(cls, None)
@@ -672,6 +1032,7 @@ class OutOfBoundsPiece(Piece):
     isto é, aquelas que foram criadas somente para facilitar codificação, mas não são nenhuma das 64
     casas existentes num tabuleiro real
     """
+    __slots__ = ()
 
     def __new__(cls, *args, **kwargs):
         return super().__new__(cls, None)
@@ -693,6 +1054,7 @@ class SlidingPiece(Piece):
 
     Subclasses devem preencher os membros rays e directions
     """
+    __slots__ = ()
     rays = None
     directions = None
 
@@ -709,22 +1071,23 @@ class SlidingPiece(Piece):
 
     def plmoves(self, fromsq, board, context):
         moves = []
+        cells = board._board
+        enemy = self.side.opponent()
+        start = Board._index(fromsq)
         for direction in self.directions:
-            currindex = fromsq
-            while True:
+            currindex = start + direction
+            piece = cells[currindex]
+            while piece is _NO_PIECE:
+                moves.append(Move(fromsq, currindex, MoveKind.QUIET, None))
                 currindex += direction
-                if board[currindex].kind is OutOfBoundsPiece:
-                    break
-                elif board[currindex].kind is NoPiece:
-                    moves.append(Move(fromsq, currindex, MoveKind.QUIET, None))
-                    continue
-                elif board[currindex].side is not self.side:
-                    moves.append(Move(fromsq, currindex, MoveKind.CAPTURE, None))
-                break
+                piece = cells[currindex]
+            if piece.side is enemy:
+                moves.append(Move(fromsq, currindex, MoveKind.CAPTURE, None))
         return moves
 
 
 class Rook(SlidingPiece):
+    __slots__ = ()
     rays = BoardLike((
         None, None, None, None, None, None, None, -15, None, None, None, None, None, None, None,
         None, None, None, None, None, None, None, -15, None, None, None, None, None, None, None,
@@ -747,6 +1110,7 @@ class Rook(SlidingPiece):
 
 
 class Bishop(SlidingPiece):
+    __slots__ = ()
     rays = BoardLike((
         -16, None, None, None, None, None, None, None, None, None, None, None, None, None, -14,
         None, -16, None, None, None, None, None, None, None, None, None, None, None, -14, None,
@@ -769,6 +1133,7 @@ class Bishop(SlidingPiece):
 
 
 class Queen(SlidingPiece):
+    __slots__ = ()
     rays = BoardLike((
         -16, None, None, None, None, None, None, -15, None, None, None, None, None, None, -14,
         None, -16, None, None, None, None, None, -15, None, None, None, None, None, -14, None,
@@ -791,6 +1156,7 @@ class Queen(SlidingPiece):
 
 
 class Knight(Piece):
+    __slots__ = ()
     offsets = (-17, -31, -29, -13, 17, 31, 29, 13)
 
     def attacks(self, fromsq, tosq, board):
@@ -798,16 +1164,20 @@ class Knight(Piece):
 
     def plmoves(self, fromsq, board, context):
         moves = []
+        cells = board._board
+        enemy = self.side.opponent()
+        start = Board._index(fromsq)
         for offset in self.offsets:
-            sq = fromsq + offset
-            if board[sq].kind is NoPiece:
-                moves.append(Move(fromsq, sq, MoveKind.QUIET, None))
-            elif board[sq].kind is not OutOfBoundsPiece and board[sq].side is not self.side:
-                moves.append(Move(fromsq, sq, MoveKind.CAPTURE, None))
+            piece = cells[start + offset]
+            if piece is _NO_PIECE:
+                moves.append(Move(fromsq, start + offset, MoveKind.QUIET, None))
+            elif piece.side is enemy:
+                moves.append(Move(fromsq, start + offset, MoveKind.CAPTURE, None))
         return moves
 
 
 class Pawn(Piece):
+    __slots__ = ()
     attackoffsets = {
         Side.WHITE: (-16, -14),
         Side.BLACK: (14, 16)
@@ -823,52 +1193,52 @@ class Pawn(Piece):
         Side.BLACK: 7
     }
 
+    promotionrank = {
+        Side.WHITE: 7,
+        Side.BLACK: 2
+    }
+
+    # Peças às quais um peão de cada jogador pode ser promovido, na ordem em que são geradas
+    promotions = {side: (Queen(side), Rook(side), Bishop(side), Knight(side)) for side in Side}
+
     def attacks(self, fromsq, tosq, board):
         return tosq - fromsq in self.attackoffsets[self.side]
 
     def plmoves(self, fromsq, board, context):
         moves = []
-        canpromote = False
-        # Double move
-        if Square(fromsq).rank == self.initialrank[self.side] \
-                and board[fromsq + self.walkoffset[self.side]].kind is NoPiece \
-                and board[fromsq + 2 * self.walkoffset[self.side]].kind is NoPiece:
-            moves.append(
-                Move(fromsq, fromsq + 2 * self.walkoffset[self.side], MoveKind.PAWN2, None))
-        # Promotion without capture
-        if Square(fromsq).rank == self.initialrank[self.side.opponent()] \
-                and board[fromsq + self.walkoffset[self.side]].kind is NoPiece:
-            for piece in (Queen(self.side), Rook(self.side), Bishop(self.side), Knight(self.side)):
-                moves.append(
-                    Move(fromsq, fromsq + self.walkoffset[self.side], MoveKind.PROMOTION, piece))
-            canpromote = True
-        # En passant capture
-        if context.ep is not None and context.ep - fromsq in self.attackoffsets[self.side]:
-            moves.append(Move(fromsq, context.ep, MoveKind.EP_CAPTURE, None))
-        # Normal move
-        if not canpromote and board[fromsq + self.walkoffset[self.side]].kind is NoPiece:
-            moves.append(Move(fromsq, fromsq + self.walkoffset[self.side], MoveKind.QUIET, None))
+        cells = board._board
+        side = self.side
+        enemy = side.opponent()
+        start = Board._index(fromsq)
+        rank = INDEX_RANKS[start]
+        walk = self.walkoffset[side]
+        promotes = rank == self.promotionrank[side]
+        # Normal move, double move and promotion without capture
+        if cells[start + walk] is _NO_PIECE:
+            if promotes:
+                for piece in self.promotions[side]:
+                    moves.append(Move(fromsq, start + walk, MoveKind.PROMOTION, piece))
+            else:
+                moves.append(Move(fromsq, start + walk, MoveKind.QUIET, None))
+                if rank == self.initialrank[side] and cells[start + 2 * walk] is _NO_PIECE:
+                    moves.append(Move(fromsq, start + 2 * walk, MoveKind.PAWN2, None))
         # Capture and maybe promotion
-        for attackoffset in self.attackoffsets[self.side]:
-            if board[fromsq + attackoffset].kind is not NoPiece \
-                    and board[fromsq + attackoffset].kind is not OutOfBoundsPiece \
-                    and board[fromsq + attackoffset].side is not self.side:
-                if Square(fromsq).rank == self.initialrank[self.side.opponent()]:
-                    for promotion in (Queen(self.side),
-                                      Rook(self.side), Bishop(self.side), Knight(self.side)):
-                        moves.append(Move(
-                            fromsq,
-                            fromsq + attackoffset,
-                            MoveKind.PROMOTION_CAPTURE,
-                            promotion))
+        for attackoffset in self.attackoffsets[side]:
+            if cells[start + attackoffset].side is enemy:
+                if promotes:
+                    for piece in self.promotions[side]:
+                        moves.append(
+                            Move(fromsq, start + attackoffset, MoveKind.PROMOTION_CAPTURE, piece))
                 else:
-                    moves.append(Move(fromsq, fromsq + attackoffset, MoveKind.CAPTURE, None))
-                pass
-
+                    moves.append(Move(fromsq, start + attackoffset, MoveKind.CAPTURE, None))
+        # En passant capture
+        if context.ep is not None and Board._index(context.ep) - start in self.attackoffsets[side]:
+            moves.append(Move(fromsq, context.ep, MoveKind.EP_CAPTURE, None))
         return moves
 
 
 class King(Piece):
+    __slots__ = ()
     offsets = (-1, -16, -15, -14, 1, 16, 15, 14)
 
     def attacks(self, fromsq, tosq, board):
@@ -876,33 +1246,988 @@ class King(Piece):
 
     def plmoves(self, fromsq, board, context):
         moves = []
+        cells = board._board
+        enemy = self.side.opponent()
+        start = Board._index(fromsq)
         # Quiet and capture moves
         for offset in self.offsets:
-            if board[fromsq + offset].kind is NoPiece:
-                moves.append(Move(fromsq, fromsq + offset, MoveKind.QUIET, None))
-            elif board[fromsq + offset].kind is not OutOfBoundsPiece \
-                    and board[fromsq + offset].side is not self.side:
-                moves.append(Move(fromsq, fromsq + offset, MoveKind.CAPTURE, None))
+            piece = cells[start + offset]
+            if piece is _NO_PIECE:
+                moves.append(Move(fromsq, start + offset, MoveKind.QUIET, None))
+            elif piece.side is enemy:
+                moves.append(Move(fromsq, start + offset, MoveKind.CAPTURE, None))
+        can_castle = context.can_castle[self.side]
+        if not (can_castle[0] or can_castle[1]) or board.attacked(start, enemy):
+            return moves
         # Castling queen
-        if context.can_castle[self.side][0] \
-                and board[fromsq - 1].kind is NoPiece \
-                and board[fromsq - 2].kind is NoPiece \
-                and board[fromsq - 3].kind is NoPiece \
-                and not board.attacked(fromsq, self.side.opponent()) \
-                and not board.attacked(fromsq - 1, self.side.opponent()) \
-                and not board.attacked(fromsq - 2, self.side.opponent()):
-            moves.append(Move(fromsq, fromsq - 2, MoveKind.CASTLE_QUEEN, None))
+        if can_castle[0] \
+                and cells[start - 1] is _NO_PIECE \
+                and cells[start - 2] is _NO_PIECE \
+                and cells[start - 3] is _NO_PIECE \
+                and not board.attacked(start - 1, enemy) \
+                and not board.attacked(start - 2, enemy):
+            moves.append(Move(fromsq, start - 2, MoveKind.CASTLE_QUEEN, None))
         # Castling king
-        if context.can_castle[self.side][1] \
-                and board[fromsq + 1].kind is NoPiece \
-                and board[fromsq + 2].kind is NoPiece \
-                and not board.attacked(fromsq, self.side.opponent()) \
-                and not board.attacked(fromsq + 1, self.side.opponent()) \
-                and not board.attacked(fromsq + 2, self.side.opponent()):
-            moves.append(Move(fromsq, fromsq + 2, MoveKind.CASTLE_KING, None))
+        if can_castle[1] \
+                and cells[start + 1] is _NO_PIECE \
+                and cells[start + 2] is _NO_PIECE \
+                and not board.attacked(start + 1, enemy) \
+                and not board.attacked(start + 2, enemy):
+            moves.append(Move(fromsq, start + 2, MoveKind.CASTLE_KING, None))
         return moves
 
 
+_NO_PIECE = NoPiece()
+
+
+def generate_reverse_attack_tables():
+    """
+    Gera as tabelas usadas por `Board.attacked` para procurar atacantes a partir da casa atacada
+    (em vez de percorrer todas as peças do atacante). Reusa os deslocamentos de `Knight`, `King`, `Pawn`
+    e as direções de `Rook` e `Bishop`. Todas as tabelas são indexadas pelo índice da casa atacada
+    :return: Tupla com 4 elementos:
+        - Tupla de 225 elementos. Cada um é uma tupla (raios ortogonais, raios diagonais), em que cada
+        raio é a tupla das casas válidas, em ordem, a partir da casa atacada
+        - Tupla de 225 elementos com as casas de onde um cavalo atacaria a casa
+        - Idem, para o rei
+        - Dicionário. Chave: Instância de `Side`. Valor: Tupla de 225 elementos com as casas de onde um
+        peão do jogador atacaria a casa
+    """
+    def ray(index, direction):
+        squares = []
+        index += direction
+        while 0 <= index < 225 and Square(index).valid:
+            squares.append(index)
+            index += direction
+        return tuple(squares)
+
+    def sources(index, offsets):
+        return tuple(index - offset for offset in offsets
+                     if 0 <= index - offset < 225 and Square(index - offset).valid)
+
+    sliders = []
+    knights = []
+    kings = []
+    pawns = {Side.WHITE: [], Side.BLACK: []}
+    for index in range(225):
+        sliders.append((tuple(ray(index, direction) for direction in Rook.directions),
+                        tuple(ray(index, direction) for direction in Bishop.directions)))
+        knights.append(sources(index, Knight.offsets))
+        kings.append(sources(index, King.offsets))
+        for side in Side:
+            pawns[side].append(sources(index, Pawn.attackoffsets[side]))
+    return tuple(sliders), tuple(knights), tuple(kings), \
+        {side: tuple(squares) for side, squares in pawns.items()}
+
+
+SLIDER_RAYS, KNIGHT_SOURCES, KING_SOURCES, PAWN_SOURCES = generate_reverse_attack_tables()
+
+"""
+Peças (flyweight) de cada jogador, na ordem peão, cavalo, bispo, torre, rainha, rei
+"""
+SIDE_PIECES = {side: (Pawn(side), Knight(side), Bishop(side), Rook(side), Queen(side), King(side))
+               for side in Side}
+
+# Posição de cada tipo de peça na ordem do menos para o mais valioso (ver `Board.attackers`)
+ATTACKER_ORDER = {kind: order for order, kind in enumerate((Pawn, Knight, Bishop, Rook, Queen, King))}
+# Valor do rei em `Game.see`: capturá-lo encerraria o jogo, então o rei só captura casas não defendidas
+SEE_KING_VALUE = 20000
+
+
+def generate_zobrist_keys(seed):
+    """
+    Gera as chaves aleatórias do hash Zobrist. A semente é fixa para que uma mesma posição tenha o mesmo
+    hash em qualquer processo (e, portanto, o hash possa ser guardado ou compartilhado)
+    :param seed: Semente do gerador pseudoaleatório
+    :return: Tupla com 4 elementos:
+        - Dicionário. Chave: instância (flyweight) de cada peça. Valor: tupla de 225 chaves, uma por casa
+        (0 nas casas inválidas)
+        - Dicionário. Chave: Instância de `Side`. Valor: Tupla com as chaves dos roques pelo lado da
+        rainha e pelo lado do rei
+        - Tupla de 8 chaves, uma por coluna, para a casa "en passant"
+        - Chave do jogador preto ser o jogador da vez
+    """
+    generator = Random(seed)
+    pieces = {}
+    for side in Side:
+        for kind in (Pawn, Knight, Bishop, Rook, Queen, King):
+            pieces[kind(side)] = tuple(generator.getrandbits(64) if Square(index).valid else 0
+                                       for index in range(225))
+    castle = {}
+    for side in Side:
+        castle[side] = (generator.getrandbits(64), generator.getrandbits(64))
+    ep = tuple(generator.getrandbits(64) for _ in range(8))
+    return pieces, castle, ep, generator.getrandbits(64)
+
+
+ZOBRIST_PIECES, ZOBRIST_CASTLE, ZOBRIST_EP, ZOBRIST_BLACK = generate_zobrist_keys(0x5AD0C0DE)
+
+
+def pack_score(middlegame, endgame):
+    """
+    Junta uma pontuação de meio-jogo e uma de final num só inteiro. Somas de pontuações juntadas
+    equivalem a juntar as somas (enquanto os valores couberem em 31 bits)
+    """
+    return middlegame + (endgame << 32)
+
+
+def unpack_score(score):
+    """
+    Operação inversa de `pack_score`
+    :return: Tupla (pontuação de meio-jogo, pontuação de final)
+    """
+    endgame = (score + (1 << 31)) >> 32
+    return score - (endgame << 32), endgame
+
+
+class EvalTables:
+    """
+    Tabelas da avaliação estática mantida incrementalmente por `Board` (ver `Board.evaluation`): valor
+    de cada peça, tabelas peça-casa de meio-jogo e de final e o peso de cada tipo de peça na fase do
+    jogo. Para trocar a avaliação, crie uma instância com outras tabelas e passe-a a
+    `Game.set_evaltables` (ou atribua-a a `Game.evaltables`)
+    """
+
+    def __init__(self, values, middlegame, endgame, phase):
+        """
+        :param values: Dicionário. Chave: Tipo de peça (subclasse de `Piece`). Valor: Valor da peça, em
+        centipeões
+        :param middlegame: Dicionário. Chave: Tipo de peça. Valor: Tupla de 64 bônus (em centipeões) da
+        peça em cada casa, do ponto de vista das brancas, de 'a8' a 'h8', depois de 'a7' a 'h7', e assim
+        por diante até 'h1'. Para as pretas, a tabela é espelhada verticalmente
+        :param endgame: Idem, para o final
+        :param phase: Dicionário. Chave: Tipo de peça. Valor: Peso da peça na fase do jogo. A soma dos
+        pesos das peças da posição inicial corresponde ao meio-jogo; 0, ao final
+        """
+        self.values = {}
+        self.middlegame = {}
+        self.endgame = {}
+        # Pontuações de meio-jogo e de final somadas num só inteiro (ver `pack_score`), para que mover
+        # uma peça custe uma única soma
+        self.scores = {}
+        self.phase = {}
+        for side in Side:
+            sign = 1 if side is Side.WHITE else -1
+            for kind in (Pawn, Knight, Bishop, Rook, Queen, King):
+                piece = kind(side)
+                self.values[piece] = values[kind]
+                self.phase[piece] = phase[kind]
+                self.middlegame[piece] = self.__squares(values[kind], middlegame[kind], side, sign)
+                self.endgame[piece] = self.__squares(values[kind], endgame[kind], side, sign)
+                self.scores[piece] = tuple(pack_score(middle, end) for middle, end in
+                                           zip(self.middlegame[piece], self.endgame[piece]))
+        self.maxphase = 2 * sum(phase[kind] * count for kind, count in (
+            (Pawn, 8), (Knight, 2), (Bishop, 2), (Rook, 2), (Queen, 1), (King, 1)))
+
+    @staticmethod
+    def __squares(value, table, side, sign):
+        """
+        :return: Tupla de 225 elementos com o valor mais o bônus da peça em cada casa (0 nas casas
+        inválidas), positivo para as brancas e negativo para as pretas
+        """
+        out = [0] * 225
+        for index in range(225):
+            if INDEX_VALID[index]:
+                row, column = (index - 45) // 15, index % 15 - 3
+                if side is Side.BLACK:
+                    row = 7 - row
+                out[index] = sign * (value + table[8 * row + column])
+        return tuple(out)
+
+
+"""
+Tabelas padrão de `EvalTables` ("Simplified Evaluation Function", de Tomasz Michniewski). Só o rei
+muda no final, quando deve ir para o centro
+"""
+PIECE_SQUARE_TABLES = {
+    Pawn: (0, 0, 0, 0, 0, 0, 0, 0,
+           50, 50, 50, 50, 50, 50, 50, 50,
+           10, 10, 20, 30, 30, 20, 10, 10,
+           5, 5, 10, 25, 25, 10, 5, 5,
+           0, 0, 0, 20, 20, 0, 0, 0,
+           5, -5, -10, 0, 0, -10, -5, 5,
+           5, 10, 10, -20, -20, 10, 10, 5,
+           0, 0, 0, 0, 0, 0, 0, 0),
+    Knight: (-50, -40, -30, -30, -30, -30, -40, -50,
+             -40, -20, 0, 0, 0, 0, -20, -40,
+             -30, 0, 10, 15, 15, 10, 0, -30,
+             -30, 5, 15, 20, 20, 15, 5, -30,
+             -30, 0, 15, 20, 20, 15, 0, -30,
+             -30, 5, 10, 15, 15, 10, 5, -30,
+             -40, -20, 0, 5, 5, 0, -20, -40,
+             -50, -40, -30, -30, -30, -30, -40, -50),
+    Bishop: (-20, -10, -10, -10, -10, -10, -10, -20,
+             -10, 0, 0, 0, 0, 0, 0, -10,
+             -10, 0, 5, 10, 10, 5, 0, -10,
+             -10, 5, 5, 10, 10, 5, 5, -10,
+             -10, 0, 10, 10, 10, 10, 0, -10,
+             -10, 10, 10, 10, 10, 10, 10, -10,
+             -10, 5, 0, 0, 0, 0, 5, -10,
+             -20, -10, -10, -10, -10, -10, -10, -20),
+    Rook: (0, 0, 0, 0, 0, 0, 0, 0,
+           5, 10, 10, 10, 10, 10, 10, 5,
+           -5, 0, 0, 0, 0, 0, 0, -5,
+           -5, 0, 0, 0, 0, 0, 0, -5,
+           -5, 0, 0, 0, 0, 0, 0, -5,
+           -5, 0, 0, 0, 0, 0, 0, -5,
+           -5, 0, 0, 0, 0, 0, 0, -5,
+           0, 0, 0, 5, 5, 0, 0, 0),
+    Queen: (-20, -10, -10, -5, -5, -10, -10, -20,
+            -10, 0, 0, 0, 0, 0, 0, -10,
+            -10, 0, 5, 5, 5, 5, 0, -10,
+            -5, 0, 5, 5, 5, 5, 0, -5,
+            0, 0, 5, 5, 5, 5, 0, -5,
+            -10, 5, 5, 5, 5, 5, 0, -10,
+            -10, 0, 5, 0, 0, 0, 0, -10,
+            -20, -10, -10, -5, -5, -10, -10, -20),
+    King: (-30, -40, -40, -50, -50, -40, -40, -30,
+           -30, -40, -40, -50, -50, -40, -40, -30,
+           -30, -40, -40, -50, -50, -40, -40, -30,
+           -30, -40, -40, -50, -50, -40, -40, -30,
+           -20, -30, -30, -40, -40, -30, -30, -20,
+           -10, -20, -20, -20, -20, -20, -20, -10,
+           20, 20, 0, 0, 0, 0, 20, 20,
+           20, 30, 10, 0, 0, 10, 30, 20)
+}
+
+KING_ENDGAME_TABLE = (-50, -40, -30, -20, -20, -30, -40, -50,
+                      -30, -20, -10, 0, 0, -10, -20, -30,
+                      -30, -10, 20, 30, 30, 20, -10, -30,
+                      -30, -10, 30, 40, 40, 30, -10, -30,
+                      -30, -10, 30, 40, 40, 30, -10, -30,
+                      -30, -10, 20, 30, 30, 20, -10, -30,
+                      -30, -30, 0, 0, 0, 0, -30, -30,
+                      -50, -30, -30, -30, -30, -30, -30, -50)
+
+"""
+Tabelas de avaliação usadas, por padrão, por todos os tabuleiros (ver `EvalTables`)
+"""
+EVAL_TABLES = EvalTables(
+    {Pawn: 100, Knight: 320, Bishop: 330, Rook: 500, Queen: 900, King: 0},
+    PIECE_SQUARE_TABLES,
+    {kind: KING_ENDGAME_TABLE if kind is King else table for kind, table in PIECE_SQUARE_TABLES.items()},
+    {Pawn: 0, Knight: 1, Bishop: 1, Rook: 2, Queen: 4, King: 0})
+
+
+def generate_bitboard_squares():
+    """
+    Função de ajuda à classe `BitBoard`.
+    :return: Tupla com 2 elementos. O primeiro é uma tupla de 225 elementos que associa o índice de cada
+    casa do tabuleiro "generalizado" ao índice do bit correspondente (de 0 a 63, sendo 0 a casa 'a1' e
+    63 a casa 'h8'), ou `None` para casas inválidas. O segundo é uma tupla de 64 elementos que associa
+    cada bit à instância de `Square` correspondente
+    """
+    to64 = [None] * 225
+    squares = [None] * 64
+    for index in range(225):
+        square = Square(index)
+        if square.valid:
+            bit = 8 * (square.rank - 1) + index % 15 - 3
+            to64[index] = bit
+            squares[bit] = square
+    return tuple(to64), tuple(squares)
+
+
+def generate_leaper_attacks(steps):
+    """
+    Função de ajuda à classe `BitBoard`.
+    :param steps: Deslocamentos (coluna, linha) de uma peça que "salta" (cavalo, rei, peão)
+    :return: Tupla de 64 inteiros. Cada um é o bitboard das casas atingidas a partir do bit de mesmo índice
+    """
+    out = []
+    for bit in range(64):
+        attacks = 0
+        for dfile, drank in steps:
+            file, rank = bit % 8 + dfile, bit // 8 + drank
+            if 0 <= file < 8 and 0 <= rank < 8:
+                attacks |= 1 << (8 * rank + file)
+        out.append(attacks)
+    return tuple(out)
+
+
+def generate_rays(dfile, drank):
+    """
+    Função de ajuda à classe `BitBoard`.
+    :return: Tupla de 64 inteiros. Cada um é o bitboard do raio que parte do bit de mesmo índice (sem
+    incluí-lo) na direção (`dfile`, `drank`) até a borda do tabuleiro
+    """
+    out = []
+    for bit in range(64):
+        ray = 0
+        file, rank = bit % 8 + dfile, bit // 8 + drank
+        while 0 <= file < 8 and 0 <= rank < 8:
+            ray |= 1 << (8 * rank + file)
+            file, rank = file + dfile, rank + drank
+        out.append(ray)
+    return tuple(out)
+
+
+def generate_piece_index(kinds):
+    """
+    Função de ajuda à classe `BitBoard`.
+    :param kinds: Tupla com os tipos de peça (subclasses de `Piece`)
+    :return: Dicionário cujas chaves são as instâncias (flyweight) de cada peça de cada jogador e cujos
+    valores são tuplas (índice do jogador, índice do tipo de peça em `kinds`)
+    """
+    out = {}
+    for side in Side:
+        for index, kind in enumerate(kinds):
+            out[kind(side)] = (side.value, index)
+    return out
+
+
+class BitBoard(Board):
+    """
+    Backend alternativo de `Board`, que, além da lista de 225 casas (necessária para `BoardLike`),
+    mantém um bitboard (inteiro de 64 bits) para cada tipo de peça de cada jogador e um para a ocupação
+    de cada jogador.
+
+    Geração de movimentos pseudolegais e `attacked` são feitas com operações sobre inteiros e tabelas
+    pré-computadas de ataques de cavalo, rei e peão (e raios para as peças deslizantes), sem percorrer
+    a lista de casas.
+
+    Índices de bits vão de 0 ('a1') a 63 ('h8'). A interface pública continua recebendo e devolvendo
+    instâncias de `Square`
+    """
+    TO64, SQUARES = generate_bitboard_squares()
+
+    KNIGHT_ATTACKS = generate_leaper_attacks(
+        ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)))
+    KING_ATTACKS = generate_leaper_attacks(
+        ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)))
+    # Casas atacadas por um peão de cada jogador (índice 0: brancas; 1: pretas)
+    PAWN_ATTACKS = (generate_leaper_attacks(((-1, 1), (1, 1))),
+                    generate_leaper_attacks(((-1, -1), (1, -1))))
+
+    # Raios em que o primeiro bloqueador é o bit menos significativo (índices crescentes) e
+    # aqueles em que é o mais significativo (índices decrescentes)
+    DIAGONAL_RAYS_UP = (generate_rays(1, 1), generate_rays(-1, 1))
+    DIAGONAL_RAYS_DOWN = (generate_rays(1, -1), generate_rays(-1, -1))
+    ORTHOGONAL_RAYS_UP = (generate_rays(0, 1), generate_rays(1, 0))
+    ORTHOGONAL_RAYS_DOWN = (generate_rays(0, -1), generate_rays(-1, 0))
+
+    # Índice de cada tipo de peça nas listas de bitboards
+    PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+    KINDS = (Pawn, Knight, Bishop, Rook, Queen, King)
+    # { [piece: Piece]: (índice do jogador, índice do tipo de peça) }
+    PIECE_INDEX = generate_piece_index(KINDS)
+
+    def __init__(self, datalist, evaltables=None):
+        BoardLike.__init__(self, datalist)
+        # { [side: int]: [kind: int] -> bitboard }
+        self._pieces = [[0] * 6, [0] * 6]
+        # Ocupação de cada jogador
+        self._occupancy = [0, 0]
+        self._zobrist = 0
+        for index, piece in enumerate(self._board):
+            if self.TO64[index] is not None and piece.side is not None:
+                side, kind = self.PIECE_INDEX[piece]
+                self._pieces[side][kind] |= 1 << self.TO64[index]
+                self._occupancy[side] |= 1 << self.TO64[index]
+                self._zobrist ^= ZOBRIST_PIECES[piece][index]
+        self.set_evaltables(EVAL_TABLES if evaltables is None else evaltables)
+
+    def copy(self):
+        board = object.__new__(self.__class__)
+        board._board = self._board[:]
+        board._pieces = [self._pieces[0][:], self._pieces[1][:]]
+        board._occupancy = self._occupancy[:]
+        board._zobrist = self._zobrist
+        board._copytotals(self)
+        return board
+
+    @classmethod
+    def _slider_attacks(cls, bit, occupied, rays_up, rays_down):
+        """
+        :return: Bitboard das casas atingidas a partir de `bit` pelos raios dados, parando no primeiro
+        bloqueador de cada raio (que é incluído)
+        """
+        attacks = 0
+        for rays in rays_up:
+            ray = rays[bit]
+            blockers = ray & occupied
+            if blockers:
+                ray ^= rays[(blockers & -blockers).bit_length() - 1]
+            attacks |= ray
+        for rays in rays_down:
+            ray = rays[bit]
+            blockers = ray & occupied
+            if blockers:
+                ray ^= rays[blockers.bit_length() - 1]
+            attacks |= ray
+        return attacks
+
+    def _attacked_bit(self, bit, side):
+        """
+        Versão de `attacked` que recebe o índice do bit da casa e o índice (0 ou 1) do jogador atacante
+        """
+        pieces = self._pieces[side]
+        if self.KNIGHT_ATTACKS[bit] & pieces[self.KNIGHT] \
+                or self.KING_ATTACKS[bit] & pieces[self.KING] \
+                or self.PAWN_ATTACKS[1 - side][bit] & pieces[self.PAWN]:
+            return True
+        occupied = self._occupancy[0] | self._occupancy[1]
+        diagonal = pieces[self.BISHOP] | pieces[self.QUEEN]
+        if diagonal and self._slider_attacks(
+                bit, occupied, self.DIAGONAL_RAYS_UP, self.DIAGONAL_RAYS_DOWN) & diagonal:
+            return True
+        orthogonal = pieces[self.ROOK] | pieces[self.QUEEN]
+        if orthogonal and self._slider_attacks(
+                bit, occupied, self.ORTHOGONAL_RAYS_UP, self.ORTHOGONAL_RAYS_DOWN) & orthogonal:
+            return True
+        return False
+
+    def occuppied(self, side):
+        squares = []
+        occupied = self._occupancy[side.value]
+        while occupied:
+            lowest = occupied & -occupied
+            squares.append(self.SQUARES[lowest.bit_length() - 1])
+            occupied ^= lowest
+        return squares
+
+    def attacked(self, square, side):
+        return self._attacked_bit(self.TO64[self._index(square)], side.value)
+
+    def king(self, side):
+        king = self._pieces[side.value][self.KING]
+        if not king:
+            return None
+        return self.SQUARES[king.bit_length() - 1]
+
+    def _movepiece(self, fromsq, tosq):
+        fromindex = self._index(fromsq)
+        toindex = self._index(tosq)
+        piece = self._board[fromindex]
+        oldpiece = self._board[toindex]
+        if oldpiece.kind is not NoPiece:
+            self._removepiece(toindex)
+        self._board[fromindex] = _NO_PIECE
+        self._board[toindex] = piece
+        side, kind = self.PIECE_INDEX[piece]
+        bits = (1 << self.TO64[fromindex]) | (1 << self.TO64[toindex])
+        self._pieces[side][kind] ^= bits
+        self._occupancy[side] ^= bits
+        self._zobrist ^= ZOBRIST_PIECES[piece][fromindex] ^ ZOBRIST_PIECES[piece][toindex]
+        scores = self._evaltables.scores[piece]
+        self._score += scores[toindex] - scores[fromindex]
+        return oldpiece
+
+    def _addpiece(self, piece, square):
+        index = self._index(square)
+        self._board[index] = piece
+        side, kind = self.PIECE_INDEX[piece]
+        bit = 1 << self.TO64[index]
+        self._pieces[side][kind] |= bit
+        self._occupancy[side] |= bit
+        self._zobrist ^= ZOBRIST_PIECES[piece][index]
+        self._addtotals(piece, index)
+
+    def _removepiece(self, square):
+        index = self._index(square)
+        piece = self._board[index]
+        self._board[index] = _NO_PIECE
+        side, kind = self.PIECE_INDEX[piece]
+        bit = ~(1 << self.TO64[index])
+        self._pieces[side][kind] &= bit
+        self._occupancy[side] &= bit
+        self._zobrist ^= ZOBRIST_PIECES[piece][index]
+        self._removetotals(piece, index)
+        return piece
+
+    def plmoves(self, square, context):
+        return [unpack_move(code) for code in self.plcodes(square, context)]
+
+    def plcodes(self, square, context):
+        """
+        Gera os movimentos diretamente codificados (ver `pack_move`), sem criar instâncias de `Move`
+        """
+        index = self._index(square)
+        piece = self._board[index]
+        side, kind = self.PIECE_INDEX[piece]
+        bit = self.TO64[index]
+        own = self._occupancy[side]
+        enemy = self._occupancy[1 - side]
+        occupied = own | enemy
+        codes = []
+        if kind == self.PAWN:
+            self.__pawncodes(bit, side, enemy, occupied, context, codes)
+            return codes
+        if kind == self.KNIGHT:
+            targets = self.KNIGHT_ATTACKS[bit]
+        elif kind == self.KING:
+            targets = self.KING_ATTACKS[bit]
+            self.__castlecodes(bit, side, occupied, context.can_castle[piece.side], codes)
+        elif kind == self.BISHOP:
+            targets = self._slider_attacks(
+                bit, occupied, self.DIAGONAL_RAYS_UP, self.DIAGONAL_RAYS_DOWN)
+        elif kind == self.ROOK:
+            targets = self._slider_attacks(
+                bit, occupied, self.ORTHOGONAL_RAYS_UP, self.ORTHOGONAL_RAYS_DOWN)
+        else:
+            targets = self._slider_attacks(
+                bit, occupied, self.DIAGONAL_RAYS_UP, self.DIAGONAL_RAYS_DOWN) | \
+                      self._slider_attacks(
+                          bit, occupied, self.ORTHOGONAL_RAYS_UP, self.ORTHOGONAL_RAYS_DOWN)
+        captures = targets & enemy
+        quiet = targets & ~occupied
+        while captures:
+            lowest = captures & -captures
+            codes.append(bit | (lowest.bit_length() - 1) << 6 | PACKED_CAPTURE << 12)
+            captures ^= lowest
+        while quiet:
+            lowest = quiet & -quiet
+            codes.append(bit | (lowest.bit_length() - 1) << 6)
+            quiet ^= lowest
+        return codes
+
+    def __pawncodes(self, bit, side, enemy, occupied, context, codes):
+        forward = 8 if side == 0 else -8
+        promotes = bit // 8 == (6 if side == 0 else 1)
+        target = bit + forward
+        if not occupied & (1 << target):
+            if promotes:
+                for flag in PACKED_PROMOTION_FLAGS:
+                    codes.append(bit | target << 6 | flag << 12)
+            else:
+                codes.append(bit | target << 6)
+                if bit // 8 == (1 if side == 0 else 6) \
+                        and not occupied & (1 << (target + forward)):
+                    codes.append(bit | (target + forward) << 6 | PACKED_PAWN2 << 12)
+        targets = self.PAWN_ATTACKS[side][bit] & enemy
+        while targets:
+            lowest = targets & -targets
+            target = lowest.bit_length() - 1
+            if promotes:
+                for flag in PACKED_PROMOTION_FLAGS:
+                    codes.append(bit | target << 6 | (flag | PACKED_CAPTURE) << 12)
+            else:
+                codes.append(bit | target << 6 | PACKED_CAPTURE << 12)
+            targets ^= lowest
+        if context.ep is not None:
+            ep = self.TO64[self._index(context.ep)]
+            if self.PAWN_ATTACKS[side][bit] & (1 << ep):
+                codes.append(bit | ep << 6 | PACKED_EP_CAPTURE << 12)
+
+    def __castlecodes(self, bit, side, occupied, can_castle, codes):
+        if not (can_castle[0] or can_castle[1]) or self._attacked_bit(bit, 1 - side):
+            return
+        # Castling queen
+        if can_castle[0] and not occupied & (0b111 << (bit - 3)) \
+                and not self._attacked_bit(bit - 1, 1 - side) \
+                and not self._attacked_bit(bit - 2, 1 - side):
+            codes.append(bit | (bit - 2) << 6 | PACKED_CASTLE_QUEEN << 12)
+        # Castling king
+        if can_castle[1] and not occupied & (0b11 << (bit + 1)) \
+                and not self._attacked_bit(bit + 1, 1 - side) \
+                and not self._attacked_bit(bit + 2, 1 - side):
+            codes.append(bit | (bit + 2) << 6 | PACKED_CASTLE_KING << 12)
+
+
+class AttackMapBoard(Board):
+    """
+    Backend de `Board` que mantém, para cada jogador, um mapa de ataques: para cada casa, o conjunto
+    das casas das peças do jogador que a atacam (o número de atacantes é o tamanho do conjunto).
+
+    Os mapas são atualizados incrementalmente pelas funções protegidas que alteram o tabuleiro:
+    além de somar/subtrair os ataques da peça que entra/sai de uma casa, os raios das peças deslizantes
+    que passam pela casa são cortados (casa passa a estar ocupada) ou estendidos (casa esvaziada).
+    Com isso, `attacked` é uma consulta O(1), ao custo de mais trabalho em cada alteração do tabuleiro
+    """
+
+    def __init__(self, datalist, evaltables=None):
+        super().__init__(datalist, evaltables)
+        # { [side: int]: [casa: int] -> conjunto de casas de peças que atacam a casa }
+        self._attackers = ([set() for _ in range(225)], [set() for _ in range(225)])
+        # { [casa de uma peça: int]: lista de casas atacadas por ela }
+        self._targets = {}
+        for index, piece in enumerate(self._board):
+            if piece.side is not None:
+                self.__addattacks(index, piece)
+
+    def copy(self):
+        board = super().copy()
+        board._attackers = tuple([set(attackers) for attackers in side] for side in self._attackers)
+        board._targets = {index: targets[:] for index, targets in self._targets.items()}
+        return board
+
+    def attacked(self, square, side):
+        return len(self._attackers[side.value][self._index(square)]) > 0
+
+    def _movepiece(self, fromsq, tosq):
+        fromindex = self._index(fromsq)
+        toindex = self._index(tosq)
+        oldpiece = self._board[toindex]
+        capture = oldpiece.kind is not NoPiece
+        if capture:
+            self.__removeattacks(toindex, oldpiece)
+        # A peça capturada ainda está no tabuleiro, então os raios estendidos a partir de `fromsq`
+        # param em `tosq`
+        self.__removeattacks(fromindex, self._board[fromindex])
+        self.__unblock(fromindex)
+        if capture:
+            Board._removepiece(self, toindex)
+        Board._movepiece(self, fromindex, toindex)
+        if not capture:
+            self.__block(toindex)
+        self.__addattacks(toindex, self._board[toindex])
+        return oldpiece
+
+    def _addpiece(self, piece, square):
+        index = self._index(square)
+        super()._addpiece(piece, index)
+        self.__block(index)
+        self.__addattacks(index, piece)
+
+    def _removepiece(self, square):
+        index = self._index(square)
+        self.__removeattacks(index, self._board[index])
+        piece = super()._removepiece(index)
+        self.__unblock(index)
+        return piece
+
+    def __targetsof(self, index, piece):
+        """
+        :return: Lista das casas (índices) atacadas por `piece` estando na casa `index`
+        """
+        targets = []
+        if isinstance(piece, SlidingPiece):
+            for direction in piece.directions:
+                target = index + direction
+                while self._board[target].kind is not OutOfBoundsPiece:
+                    targets.append(target)
+                    if self._board[target].kind is not NoPiece:
+                        break
+                    target += direction
+            return targets
+        if piece.kind is Pawn:
+            offsets = Pawn.attackoffsets[piece.side]
+        else:
+            offsets = piece.offsets
+        for offset in offsets:
+            if self._board[index + offset].kind is not OutOfBoundsPiece:
+                targets.append(index + offset)
+        return targets
+
+    def __addattacks(self, index, piece):
+        attackers = self._attackers[piece.side.value]
+        targets = self.__targetsof(index, piece)
+        for target in targets:
+            attackers[target].add(index)
+        self._targets[index] = targets
+
+    def __removeattacks(self, index, piece):
+        attackers = self._attackers[piece.side.value]
+        for target in self._targets.pop(index):
+            attackers[target].discard(index)
+
+    def __sliders_through(self, index):
+        """
+        :return: Lista de tuplas (casa, lado, direção) das peças deslizantes cujos raios atingem a casa
+        `index` (a direção aponta da peça para a casa)
+        """
+        sliders = []
+        for side in (0, 1):
+            for attacker in self._attackers[side][index]:
+                if isinstance(self._board[attacker], SlidingPiece):
+                    sliders.append((attacker, side, -Queen.rays[15 * 15 // 2 + attacker - index]))
+        return sliders
+
+    def __block(self, index):
+        """
+        A casa `index` acabou de ser ocupada: corta os raios que passavam por ela
+        """
+        for attacker, side, direction in self.__sliders_through(index):
+            targets = self._targets[attacker]
+            target = index + direction
+            while self._board[target].kind is not OutOfBoundsPiece:
+                self._attackers[side][target].discard(attacker)
+                targets.remove(target)
+                if self._board[target].kind is not NoPiece:
+                    break
+                target += direction
+
+    def __unblock(self, index):
+        """
+        A casa `index` acabou de ser esvaziada: estende os raios que paravam nela
+        """
+        for attacker, side, direction in self.__sliders_through(index):
+            targets = self._targets[attacker]
+            target = index + direction
+            while self._board[target].kind is not OutOfBoundsPiece:
+                self._attackers[side][target].add(attacker)
+                targets.append(target)
+                if self._board[target].kind is not NoPiece:
+                    break
+                target += direction
+
+
+"""
+Codificação compacta de movimentos: um inteiro de 16 bits com a casa de origem nos bits 0 a 5, a de
+destino nos bits 6 a 11 (ambas como índices de bit de `BitBoard`: 0 é 'a1' e 63 é 'h8') e o tipo do
+movimento nos bits 12 a 15. Nas promoções, o bit 15 é ligado, o bit 14 indica captura e os bits 12 e 13
+dão a peça promovida (índice em `PACKED_PROMOTIONS`). Listas de movimentos codificados cabem em
+`array('H')`
+"""
+PACKED_QUIET, PACKED_PAWN2, PACKED_CASTLE_KING, PACKED_CASTLE_QUEEN = 0, 1, 2, 3
+PACKED_CAPTURE, PACKED_EP_CAPTURE = 4, 5
+PACKED_PROMOTION, PACKED_PROMOTION_CAPTURE = 8, 12
+PACKED_PROMOTIONS = (Knight, Bishop, Rook, Queen)
+# Na ordem em que `BitBoard` gera as promoções (rainha primeiro)
+PACKED_PROMOTION_FLAGS = (PACKED_PROMOTION | 3, PACKED_PROMOTION | 2, PACKED_PROMOTION | 1,
+                          PACKED_PROMOTION)
+PACKED_FLAGS = {
+    MoveKind.QUIET: PACKED_QUIET, MoveKind.PAWN2: PACKED_PAWN2,
+    MoveKind.CASTLE_KING: PACKED_CASTLE_KING, MoveKind.CASTLE_QUEEN: PACKED_CASTLE_QUEEN,
+    MoveKind.CAPTURE: PACKED_CAPTURE, MoveKind.EP_CAPTURE: PACKED_EP_CAPTURE,
+    MoveKind.PROMOTION: PACKED_PROMOTION, MoveKind.PROMOTION_CAPTURE: PACKED_PROMOTION_CAPTURE
+}
+PACKED_KINDS = {flag: kind for kind, flag in PACKED_FLAGS.items()}
+# Índice (de 0 a 224) da casa de cada bit
+PACKED_INDEX = tuple(square.index for square in BitBoard.SQUARES)
+# Bit de cada casa, pelo nome
+UCI_BITS = {square.name: bit for bit, square in enumerate(BitBoard.SQUARES)}
+
+# { [movimento codificado: int]: instância de `Move` }. Cada código é decodificado uma única vez
+_UNPACKED = {}
+
+
+def pack_move(move):
+    """
+    Codifica um movimento num inteiro de 16 bits
+    :param move: Instância de `Move`
+    :return: int
+    """
+    flag = PACKED_FLAGS[move.kind]
+    if move.promotion is not None:
+        flag |= PACKED_PROMOTIONS.index(move.promotion.kind)
+    return BitBoard.TO64[Board._index(move.fromsq)] | BitBoard.TO64[Board._index(move.tosq)] << 6 | \
+        flag << 12
+
+
+def unpack_move(code):
+    """
+    Operação inversa de `pack_move`. Movimentos iguais decodificam para a mesma instância de `Move`
+    :param code: int
+    :return: Instância de `Move`
+    """
+    move = _UNPACKED.get(code)
+    if move is None:
+        flag = code >> 12
+        tosq = BitBoard.SQUARES[code >> 6 & 63]
+        if flag & PACKED_PROMOTION:
+            promotion = PACKED_PROMOTIONS[flag & 3](Side.WHITE if tosq.rank == 8 else Side.BLACK)
+            kind = PACKED_KINDS[flag & PACKED_PROMOTION_CAPTURE]
+        elif flag in PACKED_KINDS:
+            promotion = None
+            kind = PACKED_KINDS[flag]
+        else:
+            raise ValueError('Invalid packed move: ' + str(code))
+        move = _UNPACKED[code] = Move(BitBoard.SQUARES[code & 63], tosq, kind, promotion)
+    return move
+
+
+def packed_to_uci(code):
+    """
+    :param code: Movimento codificado (ver `pack_move`)
+    :return: String do movimento no formato aceito por `Game.make` (UCI, com a letra da promoção em
+    maiúscula), como "e2e4" ou "a7a8N"
+    """
+    movestr = BitBoard.SQUARES[code & 63].name + BitBoard.SQUARES[code >> 6 & 63].name
+    if code >> 12 & PACKED_PROMOTION:
+        movestr += 'NBRQ'[code >> 12 & 3]
+    return movestr
+
+
+class MoveCache:
+    """
+    Cache LRU (compartilhado pelo processo) das listas de movimentos legais de posições já analisadas,
+    indexado pelo hash Zobrist da posição (ver `Game.hash`). Cada entrada guarda os movimentos legais,
+    codificados num `array('H')` (ver `pack_move`), e se o jogador da vez está em xeque.
+
+    O tamanho é limitado por uma estimativa da memória ocupada pelas entradas: ao inserir uma entrada
+    que ultrapasse `max_bytes`, as menos usadas recentemente são descartadas. É seguro usar a mesma
+    instância em várias threads
+    """
+    # Estimativa de memória de uma entrada sem movimentos (nó do OrderedDict, chave, tupla, array
+    # vazio) e de um movimento codificado
+    ENTRY_BYTES = 200 + sys.getsizeof(array('H'))
+    MOVE_BYTES = array('H').itemsize
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        """
+        :param max_bytes: Limite (aproximado) de memória do cache. 0 desativa o cache
+        """
+        self.__entries = OrderedDict()
+        self.__lock = Lock()
+        self.__max_bytes = max_bytes
+        self.__bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        :param key: Hash da posição
+        :return: Tupla (movimentos legais, xeque) guardada para a posição, ou `None`
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, moves, check):
+        """
+        Guarda a análise de uma posição
+        :param key: Hash da posição
+        :param moves: `array('H')` com os movimentos legais codificados
+        :param check: Se o jogador da vez está em xeque
+        :return: A tupla (movimentos legais, xeque) guardada
+        """
+        entry = (moves, check)
+        size = self.ENTRY_BYTES + self.MOVE_BYTES * len(moves)
+        with self.__lock:
+            if key in self.__entries or size > self.__max_bytes:
+                return entry
+            self.__entries[key] = entry
+            self.__bytes += size
+            self.__evict()
+        return entry
+
+    def resize(self, max_bytes):
+        """
+        Altera o limite de memória, descartando entradas se necessário
+        """
+        with self.__lock:
+            self.__max_bytes = max_bytes
+            self.__evict()
+
+    def clear(self):
+        """
+        Esvazia o cache e zera os contadores
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.__bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """
+        :return: Dicionário com os contadores do cache (acertos, falhas, descartes), o número de entradas
+        e a memória estimada ocupada e máxima
+        """
+        with self.__lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.__entries),
+                'bytes': self.__bytes,
+                'max_bytes': self.__max_bytes
+            }
+
+    def __evict(self):
+        while self.__bytes > self.__max_bytes and self.__entries:
+            _, (moves, _) = self.__entries.popitem(last=False)
+            self.__bytes -= self.ENTRY_BYTES + self.MOVE_BYTES * len(moves)
+            self.evictions += 1
+
+
+"""
+Cache de movimentos legais usado, por padrão, por todas as instâncias de `Game` do processo
+"""
+MOVE_CACHE = MoveCache()
+
+
+class EngineCounters:
+    """
+    Contadores do trabalho feito pela engine (ver `Game.counters`) e tempos acumulados dos métodos
+    medidos (ver `Game.set_timing_hook` e `record`). Uma instância costuma ser compartilhada por todos
+    os jogos do processo, então os números são os do processo. Os incrementos não usam trava: com
+    várias threads, algum pode se perder.
+
+    Contadores:
+        - plmoves: { [tipo de peça]: movimentos pseudolegais gerados }
+        - make: Movimentos feitos (`make` e `make_unchecked`)
+        - unmake: Movimentos desfeitos
+        - attacked: Consultas `Board.attacked` feitas por `Game` para a segurança do rei: se o rei
+        está em xeque e se cada casa para onde ele pode ir é atacada. As feitas pelo tabuleiro dentro
+        da geração pseudolegal (as casas por onde o rei passa no roque) não são contadas: contá-las
+        exigiria um teste a mais no laço mais quente de cada backend
+        - rejected: Movimentos pseudolegais descartados por deixarem o rei em xeque
+        - cache_hits, cache_misses: Consultas a `Game.movecache`
+        - timings: { [nome do método]: [chamadas, segundos] }, preenchido por `record`. Só as chamadas
+        de fora de outro método medido contam (ver `timed`), então os tempos não se sobrepõem
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Zera os contadores
+        """
+        self.plmoves = {kind: 0 for kind in (Pawn, Knight, Bishop, Rook, Queen, King)}
+        self.make = self.unmake = self.attacked = self.rejected = 0
+        self.cache_hits = self.cache_misses = 0
+        self.timings = {}
+
+    def record(self, name, seconds):
+        """
+        Gancho de tempo (ver `Game.set_timing_hook`) que acumula as chamadas e o tempo de cada método
+        """
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = [0, 0.0]
+        timing[0] += 1
+        timing[1] += seconds
+
+    def stats(self):
+        """
+        :return: Dicionário com os contadores (os tipos de peça pelo nome)
+        """
+        return {
+            'plmoves': {kind.__name__: count for kind, count in self.plmoves.items()},
+            'make': self.make,
+            'unmake': self.unmake,
+            'attacked': self.attacked,
+            'rejected': self.rejected,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'timings': {name: {'calls': calls, 'seconds': seconds}
+                        for name, (calls, seconds) in self.timings.items()}
+        }
+
+
+# Se a thread está dentro de um método medido (ver `timed`)
+_timing = local()
+
+
+def timed(name, method, hook):
+    """
+    Função de ajuda a `Game.set_timing_hook`
+    :return: Método que chama `method` e, em seguida, hook(name, segundos gastos). Chamado de dentro de
+    outro método medido (`moves` chama `packed_moves`, por exemplo), só chama `method`, para que o
+    mesmo tempo não seja somado duas vezes
+    """
+    def wrapper(self, *args, **kwargs):
+        if getattr(_timing, 'active', False):
+            return method(self, *args, **kwargs)
+        _timing.active = True
+        start = perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            _timing.active = False
+            hook(name, perf_counter() - start)
+    wrapper.__name__, wrapper.__doc__ = method.__name__, method.__doc__
+    return wrapper
+
+
 class Game:
     """
     Representa um jogo de xadrez ativo. Esta (junto com a classe `Side`, as subclasses de `Piece` e
@@ -911,7 +2236,10 @@ class Game:
     Todas as outras classes são "internas" à engine.
     """
 
-    class GameBoard(Board):
+    class GameBoardMixin:
+        """
+        Expõe as funções protegidas de um backend de tabuleiro (`Board` ou subclasse) para `Game`
+        """
 
         def movepiece(self, fromsq, tosq):
             return self._movepiece(fromsq, tosq)
@@ -922,13 +2250,82 @@ class Game:
         def removepiece(self, square):
             return self._removepiece(square)
 
-    Snapshot = namedtuple('Snapshot', 'turn can_castle ep antimove')
+    class GameBoard(GameBoardMixin, Board):
+        pass
+
+    class GameBitBoard(GameBoardMixin, BitBoard):
+        pass
+
+    class GameAttackMapBoard(GameBoardMixin, AttackMapBoard):
+        pass
+
+    """
+    Backends de tabuleiro disponíveis. Chave: nome do backend. Valor: subclasse de `Board` usada
+    """
+    BACKENDS = {
+        'mailbox': GameBoard,
+        'bitboard': GameBitBoard,
+        'attackmap': GameAttackMapBoard
+    }
+
+    Snapshot = namedtuple('Snapshot', 'turn can_castle ep antimove key halfmove')
+
+    """
+    Resultado de `status`:
+        - check: Se o jogador da vez está em xeque
+        - movecount: Número de movimentos legais do jogador da vez
+        - checkmate: Se o jogador da vez está em xequemate
+        - stalemate: Se o jogador da vez está afogado ("stalemate")
+    """
+    Status = namedtuple('Status', 'check movecount checkmate stalemate')
+
+    """
+    Instância de `MoveCache` consultada por `moves` e `packed_moves`. Por padrão, é o cache
+    compartilhado pelo processo; atribua `None` (à classe ou a uma instância) para não usar cache
+    """
+    movecache = MOVE_CACHE
+
+    """
+    Instância de `EvalTables` usada por `evaluate` nos jogos criados a partir de então. Para trocar as
+    tabelas de um jogo já criado, use `set_evaltables`
+    """
+    evaltables = EVAL_TABLES
+
+    """
+    Instância de `Bitbases` (ver `chessgames.common.bitbases`) consultada por `probe_endgame`. None
+    (o padrão) desativa as bitbases
+    """
+    bitbases = None
+
+    """
+    Instância de `EngineCounters` incrementada pelos jogos, ou None (o padrão) para não contar nada.
+    Ver também `stats`
+    """
+    counters = None
+
+    # Métodos medidos pelo gancho de `set_timing_hook`
+    TIMED_METHODS = ('moves', 'packed_moves', 'make', 'make_unchecked', 'status', 'checkmate',
+                     'stalemate', 'insufficient_material')
+    # { [nome]: método original } dos métodos medidos enquanto houver um gancho instalado
+    __untimed = {}
 
     initialrank = {
         Side.WHITE: '1',
         Side.BLACK: '8'
     }
 
+    # Índices das casas iniciais dos reis
+    KING_SQUARES = {
+        Side.WHITE: Square('e1').index,
+        Side.BLACK: Square('e8').index
+    }
+
+    # Índices das casas iniciais das torres de cada jogador: (lado da rainha, lado do rei)
+    ROOK_SQUARES = {
+        Side.WHITE: (Square('a1').index, Square('h1').index),
+        Side.BLACK: (Square('a8').index, Square('h8').index)
+    }
+
     PIECES_INIT = {
         "a1": Rook(Side.WHITE), "b1": Knight(Side.WHITE), "c1": Bishop(Side.WHITE),
         "d1": Queen(Side.WHITE), "e1": King(Side.WHITE), "f1": Bishop(Side.WHITE),
@@ -943,8 +2340,100 @@ class Game:
         "g7": Pawn(Side.BLACK), "h7": Pawn(Side.BLACK),
     }
 
+    # Ordem em que `iter_moves` e `has_legal_move` visitam as peças: o rei (único que pode se mover em
+    # xeque duplo) e, em seguida, as peças com mais movimentos em média
+    MOBILITY_ORDER = {
+        King: 0, Queen: 1, Rook: 2, Bishop: 3, Knight: 4, Pawn: 5
+    }
+
+    # Letras usadas em FEN para cada tipo de peça (maiúsculas para brancas, minúsculas para pretas)
+    FEN_LETTERS = {
+        Pawn: 'p', Knight: 'n', Bishop: 'b', Rook: 'r', Queen: 'q', King: 'k'
+    }
+
+    # Letras usadas nas strings de movimentos de promoção (ver `make`)
+    PROMOTION_LETTERS = {
+        Knight: 'N', Bishop: 'B', Rook: 'R', Queen: 'Q'
+    }
+
+    @staticmethod
+    def from_fen(fen, backend='mailbox'):
+        """
+        Monta um jogo a partir de uma posição em notação FEN (Forsyth-Edwards Notation), por exemplo
+        "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"
+        :param fen: String FEN. Os contadores de meio-lances e de lances são opcionais (0 e 1, caso
+        omitidos)
+        :param backend: Ver `Game.__init__`
+        :return: Instância de `Game`
+        """
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError('FEN must have at least 4 fields: ' + fen)
+        placement, turn, castling, ep = fields[0:4]
+        try:
+            halfmove = int(fields[4]) if len(fields) > 4 else 0
+            fullmove = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError('FEN move counters must be integers: ' + fen)
+        letters = {letter: kind for kind, letter in Game.FEN_LETTERS.items()}
+        listgame = []
+        for row in placement.split('/'):
+            rowlength = 0
+            for char in row:
+                if char.isdigit():
+                    listgame += [NoPiece()] * int(char)
+                    rowlength += int(char)
+                elif char.lower() in letters:
+                    listgame.append(
+                        letters[char.lower()](Side.WHITE if char.isupper() else Side.BLACK))
+                    rowlength += 1
+                else:
+                    raise ValueError('Invalid piece letter in FEN: ' + char)
+            if rowlength != 8:
+                raise ValueError('FEN rank must have 8 squares: ' + row)
+        if turn not in ('w', 'b'):
+            raise ValueError('FEN side to move must be "w" or "b": ' + turn)
+        castle_rights = {
+            Side.WHITE: ('Q' in castling, 'K' in castling),
+            Side.BLACK: ('q' in castling, 'k' in castling)
+        }
+        ep_square = None if ep == '-' else Square(ep)
+        return Game(listgame, castle_rights, ep_square, Side.WHITE if turn == 'w' else Side.BLACK,
+                    backend=backend, halfmove=halfmove, fullmove=fullmove)
+
+    def to_fen(self):
+        """
+        Operação inversa de `from_fen`
+        :return: String FEN da posição atual, com os contadores de meio-lances e de lances. A casa "en
+        passant" é escrita sempre que o último movimento foi um avanço duplo de peão
+        """
+        rows = []
+        for rank in range(8, 0, -1):
+            row = ''
+            empty = 0
+            for file in 'abcdefgh':
+                piece = self.__board[Square(file + str(rank))]
+                if piece.kind is NoPiece:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                letter = self.FEN_LETTERS[piece.kind]
+                row += letter.upper() if piece.side is Side.WHITE else letter
+            if empty:
+                row += str(empty)
+            rows.append(row)
+        white = self.__context.can_castle[Side.WHITE]
+        black = self.__context.can_castle[Side.BLACK]
+        castling = ''.join(letter for letter, right in (
+            ('K', white[1]), ('Q', white[0]), ('k', black[1]), ('q', black[0])) if right)
+        ep = '-' if self.__context.ep is None else Square(self.__context.ep).name
+        return ' '.join(('/'.join(rows), 'w' if self.__turn is Side.WHITE else 'b', castling or '-',
+                         ep, str(self.__halfmove), str(self.__fullmove)))
+
     @staticmethod
-    def default_game():
+    def default_game(backend='mailbox'):
         positions = []
         for c in "abcdefgh":
             for i in range(1, 9):
@@ -957,9 +2446,11 @@ class Game:
                     listgame.append(NoPiece())
                 else:
                     listgame.append(piece)
-        return Game(listgame, {Side.WHITE: (True, True), Side.BLACK: (True, True)}, None, Side.WHITE)
+        return Game(listgame, {Side.WHITE: (True, True), Side.BLACK: (True, True)}, None, Side.WHITE,
+                    backend=backend)
 
-    def __init__(self, board_array, castle_rights, ep_square, turn):
+    def __init__(self, board_array, castle_rights, ep_square, turn, backend='mailbox', halfmove=0,
+                 fullmove=1):
         """
 
         :param board_array: Lista com 64 elementos. Cada elemento de ser uma instância de `Piece` (
@@ -972,6 +2463,11 @@ class Game:
         `ep_square` pode ser não-nulo somente no caso de o jogo já começar numa configuração de peças
         em que seja possível ao jogador da vez fazer uma jogada "en passant"
         :param turn: Instância de `Side`. Indica qual jogador está prestes a jogar inicialmente
+        :param backend: Nome do backend de tabuleiro (uma das chaves de `Game.BACKENDS`). 'mailbox' usa
+        a lista de 225 casas de `Board`; 'bitboard' usa `BitBoard`, mais rápido para gerar movimentos;
+        'attackmap' usa `AttackMapBoard`, em que `Board.attacked` é O(1)
+        :param halfmove: Meio-lances desde a última captura ou movimento de peão (regra dos 50 lances)
+        :param fullmove: Número do lance atual. Começa em 1 e aumenta após cada movimento das pretas
         """
         if len(board_array) != 64:
             raise ValueError('Can only construct a Game with a 8 * 8 array')
@@ -982,13 +2478,64 @@ class Game:
             board += [OutOfBoundsPiece()] * 3 + board_array[8 * row:8 * row + 8] + \
                      [OutOfBoundsPiece()] * 4
         board += ([OutOfBoundsPiece()] * 15) * 4
-        self.__board = self.GameBoard(board)
+        if backend not in self.BACKENDS:
+            raise ValueError('Unknown board backend: ' + str(backend))
+        self.__board = self.BACKENDS[backend](board, self.evaltables)
         self.__context = Context({
             Side.WHITE: self.__board.king(Side.WHITE),
             Side.BLACK: self.__board.king(Side.BLACK)
         }, castle_rights, ep_square)
         self.__turn = turn
         self.__history = deque()
+        self.__halfmove = halfmove
+        self.__fullmove = fullmove
+        # Parte do hash Zobrist que não depende das peças (ver `__state_key`)
+        self.__statekey = self.__state_key()
+        # { [hash da posição]: número de vezes que ela ocorreu } (ver `is_threefold`)
+        self.__repetitions = {self.hash(): 1}
+        # Resultado de `status` e índice de movimentos legais (ver `__lookup`) da posição atual,
+        # calculados sob demanda
+        self.__status = None
+        self.__ucimoves = None
+
+    def backend(self):
+        """
+
+        :return: Nome do backend de tabuleiro do jogo (uma das chaves de `BACKENDS`)
+        """
+        for name, board_class in self.BACKENDS.items():
+            if type(self.__board) is board_class:
+                return name
+
+    @classmethod
+    def set_timing_hook(cls, hook):
+        """
+        Instala um gancho chamado como hook(nome do método, segundos) depois de cada chamada, em
+        qualquer jogo, dos métodos de `TIMED_METHODS` (por exemplo, `EngineCounters.record`), exceto
+        as feitas de dentro de outro deles (ver `timed`). Sem gancho, os métodos são os originais e a
+        medição não custa nada
+        :param hook: Função, ou None para remover o gancho
+        """
+        for name in cls.TIMED_METHODS:
+            method = cls.__untimed.pop(name, None) or getattr(cls, name)
+            if hook is None:
+                setattr(cls, name, method)
+            else:
+                cls.__untimed[name] = method
+                setattr(cls, name, timed(name, method, hook))
+
+    @classmethod
+    def stats(cls):
+        """
+        :return: Dicionário com o que os jogos deste processo fizeram: o id do processo ('pid'), os
+        contadores de `counters` ('counters', None se desativados; ver `EngineCounters.stats`) e os de
+        `movecache` ('movecache', None sem cache; ver `MoveCache.stats`)
+        """
+        return {
+            'pid': os.getpid(),
+            'counters': None if cls.counters is None else cls.counters.stats(),
+            'movecache': None if cls.movecache is None else cls.movecache.stats()
+        }
 
     def turn(self):
         """
@@ -997,6 +2544,14 @@ class Game:
         """
         return self.__turn
 
+    def ply(self):
+        """
+
+        :return: Número de meio-lances jogados desde o início da partida, segundo o contador de lances
+        (ver `to_fen`). Para um jogo criado por `default_game`, é o número de movimentos feitos
+        """
+        return 2 * (self.__fullmove - 1) + (1 if self.__turn is Side.BLACK else 0)
+
     def get(self, square):
         """
 
@@ -1010,11 +2565,20 @@ class Game:
                              'is not a valid chessboard position')
         return self.__board[square]
 
+    def king(self, side):
+        """
+        :param side: Do tipo `Side`
+        :return: Instância de `Square` ocupada pelo rei do jogador `side`
+        """
+        return self.__board.king(side)
+
     def check(self):
         """
 
         :return: booleana indicando se o jogador da vez está em xeque
         """
+        if self.counters is not None:
+            self.counters.attacked += 1
         return self.__board.attacked(self.__board.king(self.__turn), self.__turn.opponent())
 
     def moves(self, square=None):
@@ -1030,34 +2594,180 @@ class Game:
         `square`, ou a lista de todos os movimentos legais, a partir de qualquer casa, caso `square`
         seja passado como `None`.
         """
+        return [unpack_move(code) for code in self.packed_moves(square)]
+
+    def packed_moves(self, square=None):
+        """
+        Igual a `moves`, mas com os movimentos codificados em inteiros de 16 bits (ver `pack_move`)
+        :return: `array('H')` com os movimentos legais codificados
+        """
+        if self.movecache is None:
+            return array('H', self.__legalmoves(square))
+        codes = self.__analysis()[0]
         if square is None:
-            moves = []
-            for square in self.__board.occuppied(self.__turn):
-                moves += self.moves(square)
-            return moves
+            return array('H', codes)
+        bit = BitBoard.TO64[Square(square).index]
+        return array('H', [code for code in codes if code & 63 == bit])
+
+    def __legalmoves(self, square=None):
+        """
+        Gera os movimentos legais codificados (ver `packed_moves`) sem consultar o cache
+        """
+        if square is None:
+            return list(self.__filterlegal(self.__board.occuppied(self.__turn)))
+        square = Square(square)
         if self.__board[square].side is not self.__turn:
             return []
-        legalmoves = []
-        piece = self.__board[square]
-        moves = piece.plmoves(square, self.__board, self.__context)
-        # print(moves)
-        for move in moves:
-            antimove = move.kind.exec(
-                move, self.__board.movepiece, self.__board.addpiece, self.__board.removepiece)
-            if not self.check():
-                legalmoves.append(move)
-            antimove.kind.exec(
-                antimove, self.__board.movepiece, self.__board.addpiece, self.__board.removepiece)
+        return list(self.__filterlegal([square]))
+
+    def iter_moves(self, square=None):
+        """
+        Igual a `moves`, mas gera os movimentos legais um a um, peça por peça (o rei e as peças de maior
+        mobilidade primeiro), sem montar a lista completa. Não consulta `movecache`.
+
+        O jogo não deve ser alterado (`make`, `unmake`) enquanto o gerador estiver em uso
+        :param square: Instância de `Square` (ou int, ou string), ou ainda o valor `None`
+        """
+        if square is None:
+            squares = self.__bymobility()
+        else:
+            square = Square(square)
+            if self.__board[square].side is not self.__turn:
+                return
+            squares = [square]
+        for code in self.__filterlegal(squares):
+            yield unpack_move(code)
+
+    def has_legal_move(self):
+        """
+        :return: Se o jogador da vez tem algum movimento legal. Para no primeiro movimento legal
+        encontrado, testando o rei e as peças de maior mobilidade primeiro
+        """
+        for _ in self.__filterlegal(self.__bymobility()):
+            return True
+        return False
+
+    def __bymobility(self):
+        """
+        :return: Casas das peças do jogador da vez, ordenadas por `MOBILITY_ORDER`
+        """
+        board = self.__board
+        return sorted(board.occuppied(self.__turn),
+                      key=lambda square: self.MOBILITY_ORDER[board[square].kind])
+
+    def __filterlegal(self, squares):
+        """
+        Gera (um a um) os movimentos legais das peças do jogador da vez que estão nas casas `squares`.
+
+        As cravadas e os xeques são calculados uma única vez (ver `Board.pins_and_checkers`), de modo
+        que um movimento pseudolegal só precisa ser executado e desfeito para testar sua legalidade no
+        caso raro de captura "en passant" (que pode revelar um ataque ao rei ao retirar duas peças da
+        mesma fileira)
+        :param squares: Lista de `Square`s ocupadas pelo jogador da vez
+        :return: Gerador de movimentos legais codificados (ver `pack_move`)
+        """
+        board = self.__board
+        king = board.king(self.__turn)
+        enemy = self.__turn.opponent()
+        checkers, blocks, pins = board.pins_and_checkers(self.__turn)
+        counters = self.counters
+        for square in squares:
+            codes = board.plcodes(square, self.__context)
+            if counters is not None:
+                counters.plmoves[board[square].kind] += len(codes)
+            if square is king:
+                yield from self.__kingmoves(king, codes, enemy, checkers)
+                continue
+            # Em xeque duplo, só o rei pode se mover
+            if len(checkers) > 1:
+                if counters is not None:
+                    counters.rejected += len(codes)
+                continue
+            pinline = pins.get(square.index)
+            for code in codes:
+                if code >> 12 == PACKED_EP_CAPTURE:
+                    if self.__probe(unpack_move(code)):
+                        yield code
+                    elif counters is not None:
+                        counters.rejected += 1
+                    continue
+                tosq = PACKED_INDEX[code >> 6 & 63]
+                if (checkers and tosq not in blocks) or (pinline is not None and tosq not in pinline):
+                    if counters is not None:
+                        counters.rejected += 1
+                    continue
+                yield code
+
+    def __kingmoves(self, king, codes, enemy, checkers):
+        """
+        Filtra os movimentos pseudolegais do rei: o destino não pode estar atacado. Em xeque, o rei sai
+        do tabuleiro durante o teste, para que não bloqueie o raio da peça que dá xeque. Roques já saem
+        de `plmoves` verificados
+        """
+        board = self.__board
+        if checkers:
+            piece = board.removepiece(king)
+        legalmoves = [code for code in codes
+                      if code >> 12 == PACKED_CASTLE_KING or code >> 12 == PACKED_CASTLE_QUEEN
+                      or not board.attacked(PACKED_INDEX[code >> 6 & 63], enemy)]
+        if checkers:
+            board.addpiece(piece, king)
+        if self.counters is not None:
+            self.counters.attacked += sum(1 for code in codes if code >> 12 not in (
+                PACKED_CASTLE_KING, PACKED_CASTLE_QUEEN))
+            self.counters.rejected += len(codes) - len(legalmoves)
         return legalmoves
 
+    def __probe(self, move):
+        """
+        Testa a legalidade de um movimento executando-o e desfazendo-o
+        :return: Se o movimento não deixa o rei do jogador da vez em xeque
+        """
+        antimove = move.kind.exec(
+            move, self.__board.movepiece, self.__board.addpiece, self.__board.removepiece)
+        legal = not self.check()
+        antimove.kind.exec(
+            antimove, self.__board.movepiece, self.__board.addpiece, self.__board.removepiece)
+        return legal
+
+    def __analysis(self):
+        """
+        Consulta `movecache` (e o preenche, se a posição ainda não estiver nele)
+        :return: Tupla (`array('H')` com todos os movimentos legais codificados, xeque do jogador da vez)
+        """
+        key = self.hash()
+        entry = self.movecache.get(key)
+        if entry is None:
+            entry = self.movecache.put(key, array('H', self.__legalmoves()), self.check())
+            if self.counters is not None:
+                self.counters.cache_misses += 1
+        elif self.counters is not None:
+            self.counters.cache_hits += 1
+        return entry
+
+    def status(self):
+        """
+        Analisa a posição atual uma única vez (xeque e movimentos legais) e guarda o resultado até o
+        próximo `make` ou `unmake`. Prefira-o a chamar `checkmate` e `stalemate` em sequência
+        :return: Instância de `Game.Status`
+        """
+        if self.__status is None:
+            if self.movecache is None:
+                check = self.check()
+                movecount = len(self.__legalmoves())
+            else:
+                codes, check = self.__analysis()
+                movecount = len(codes)
+            self.__status = self.Status(check, movecount, check and movecount == 0,
+                                        not check and movecount == 0)
+        return self.__status
+
     def checkmate(self):
         """
 
         :return: booleana indicando se o jogador da vez está em xequemate
         """
-        if not self.check():
-            return False
-        return self.moves() == []
+        return self.check() and not self.has_legal_move()
 
     def stalemate(self):
         """
@@ -1066,68 +2776,211 @@ class Game:
         condição em que o jogador não está em xeque, mas qualquer movimento que ele fizesse o deixaria
         em xeque, não havendo movimentos legais, portanto.
         """
-        if self.check():
-            return False
-        return self.moves() == []
+        return not self.check() and not self.has_legal_move()
+
+    def deflate(self, move):
+        """
+        Operação inversa de `inflate`
+        :param move: Instância de `Move`, ou o movimento codificado (ver `pack_move`)
+        :return: String representativa do movimento (ver `make`), como "e2e4" ou "a7a8N"
+        """
+        if isinstance(move, int):
+            return packed_to_uci(move)
+        movestr = Square(move.fromsq).name + Square(move.tosq).name
+        if move.promotion is not None:
+            movestr += self.PROMOTION_LETTERS[move.promotion.kind]
+        return movestr
 
     def inflate(self, movestr):
-        if len(movestr) > 5:
+        """
+        Operação inversa de `deflate`
+        :param movestr: String representativa de um movimento (ver `make`)
+        :return: Instância de `Move`, que é um movimento legal na posição atual
+        """
+        code = self.__lookup(movestr)
+        if code is None:
+            raise ValueError('Not a legal move in the current position: ' + movestr)
+        return unpack_move(code)
+
+    def __lookup(self, movestr):
+        """
+        Procura o movimento no índice de movimentos legais da posição atual (dicionário de string para
+        movimento codificado), montado na primeira consulta e descartado por `make` e `unmake`. Com o
+        índice montado, strings de movimentos ilegais são rejeitadas sem gerar movimentos
+        :return: O movimento codificado (ver `pack_move`), ou `None` caso não seja legal
+        """
+        if len(movestr) == 5:
+            movestr = movestr[:4] + movestr[4].upper()
+        elif len(movestr) != 4:
             raise ValueError('move string must be either 4 or 5 characters long')
-        fromsq = Square(movestr[0:2])
-        tosq = Square(movestr[2:4])
-        side = self.__board[fromsq].side
-        promotion = {
-            'N': Knight(side), 'R': Rook(side), 'Q': Queen(side), 'B': Bishop(side)
-        }[movestr[4]] if \
-            len(movestr) == 5 else None
-        existent = [x for x in self.__board[fromsq].plmoves(fromsq, self.__board, self.__context)
-                    if x.tosq == tosq and x.promotion == promotion]
-        return existent[0]
+        if self.__ucimoves is None:
+            codes = self.__legalmoves() if self.movecache is None else self.__analysis()[0]
+            self.__ucimoves = {packed_to_uci(code): code for code in codes}
+        return self.__ucimoves.get(movestr)
+
+    def pack(self, move):
+        """
+        :param move: Instância de `Move` ou string do movimento (ver `make`), na posição atual
+        :return: O movimento codificado num inteiro de 16 bits (ver `pack_move`)
+        """
+        if isinstance(move, str):
+            move = self.inflate(move)
+        return pack_move(move)
 
     def make(self, move):
         """
         Realiza um movimento no jogo
-        :param move: Uma instância de `Move` ou uma string representativa de um movimento. No caso
+        :param move: Uma instância de `Move`, um movimento codificado (int, ver `pack_move`; para
+        movimentos que acabaram de ser gerados, `make_unchecked` evita conferi-los de novo) ou uma
+        string representativa de um movimento. No caso
         de ser uma string, ela deve especificar a casa de origem e a de destino. Por exemplo: "a1b1"
         move a peça de a1 para b1. Se o movimento for de promoção, a promoção é especificada por
         último na string. Por exemplo: "a7a8N" move um peão de a7 para a8 e o promove a cavalo (as siglas
-        são: N para cavalo, B para bispo, Q para rainha e R para torre)
+        são: N para cavalo, B para bispo, Q para rainha e R para torre; minúsculas também são aceitas)
         :return: Tupla com instância de alguma subclasse de `Piece` representando a peça que
         foi capturada (instância de `NoPiece` caso não seja movimento de captura) e com a casa do tabuleiro
         em que ela foi capturada (ou `None` caso não seja movimento de captura)
         """
-        if isinstance(move, str):
-            move = self.inflate(move)
+        verified = False
+        if isinstance(move, int):
+            # Como as strings, só pelo índice de movimentos legais (`bool` também é `int`)
+            if move.__class__ is not int or not 0 <= move < 1 << 16 or \
+                    self.__lookup(packed_to_uci(move)) != move:
+                raise RuntimeError('Tried to execute illegal move: ' + repr(move))
+            move = unpack_move(move)
+            verified = True
+        elif isinstance(move, str):
+            code = self.__lookup(move)
+            if code is None:
+                raise RuntimeError('Tried to execute illegal move: ' + move)
+            move = unpack_move(code)
+            verified = True
         antimove = move.kind.exec(
             move, self.__board.movepiece, self.__board.addpiece, self.__board.removepiece)
-        if self.check() or self.__board[move.tosq].side is not self.__turn:
+        if not verified and (self.check() or self.__board[move.tosq].side is not self.__turn):
             antimove.kind.exec(
                 antimove, self.__board.movepiece, self.__board.addpiece, self.__board.removepiece)
             raise RuntimeError('Tried to execute illegal move: ' + str(move))
-        self.__history.append(self.Snapshot(self.__turn, {
-            Side.WHITE: self.__context.can_castle[Side.WHITE],
-            Side.BLACK: self.__context.can_castle[Side.BLACK]
-        }, self.__context.ep, antimove))
+        return self.__record(move, antimove)
+
+    def make_unchecked(self, move, verify=False):
+        """
+        Realiza um movimento já validado antes (como os de `ChessGame.history`), sem testar se é legal.
+        Uma string é decodificada direto pelas casas e pela peça movida (roque, "en passant", avanço
+        duplo de peão e promoção), sem gerar os movimentos da posição. Um movimento ilegal deixa o jogo
+        num estado inválido
+        :param move: Como em `make`
+        :param verify: Se `True` (para auditorias), confere o movimento decodificado com os movimentos
+        legais da posição, como `make`, e lança `RuntimeError` se não for um deles
+        :return: Como em `make`
+        """
+        code = self.__code(move)
+        if verify and self.__lookup(packed_to_uci(code)) != code:
+            raise RuntimeError('Tried to execute illegal move: ' + packed_to_uci(code))
+        move = unpack_move(code)
+        antimove = move.kind.exec(
+            move, self.__board.movepiece, self.__board.addpiece, self.__board.removepiece)
+        return self.__record(move, antimove)
+
+    def replay(self, history, verify=False):
+        """
+        Faz `make_unchecked` de cada movimento de `history`, em ordem
+        :param history: Lista de movimentos (como em `make`), por exemplo `ChessGame.history`
+        """
+        make = self.make_unchecked
+        for move in history:
+            make(move, verify)
+
+    def __code(self, move):
+        """
+        :param move: Como em `make_unchecked`
+        :return: O movimento codificado (ver `pack_move`)
+        """
+        if isinstance(move, str):
+            return self.__decode(move)
+        if isinstance(move, int):
+            return move
+        return pack_move(move)
+
+    def __decode(self, movestr):
+        """
+        :return: O movimento codificado (ver `pack_move`) da string `movestr`, que se supõe legal
+        """
+        try:
+            frombit, tobit = UCI_BITS[movestr[:2]], UCI_BITS[movestr[2:4]]
+            promotion = 'NBRQ'.index(movestr[4].upper()) if len(movestr) == 5 else None
+        except (KeyError, ValueError):
+            raise ValueError('Invalid move string: ' + movestr)
+        kind = self.__board[PACKED_INDEX[frombit]].kind
+        capture = self.__board[PACKED_INDEX[tobit]].side is not None
+        if promotion is not None:
+            flag = (PACKED_PROMOTION_CAPTURE if capture else PACKED_PROMOTION) | promotion
+        elif capture:
+            flag = PACKED_CAPTURE
+        elif kind is Pawn:
+            if tobit - frombit in (16, -16):
+                flag = PACKED_PAWN2
+            else:
+                flag = PACKED_QUIET if tobit - frombit in (8, -8) else PACKED_EP_CAPTURE
+        elif kind is King and tobit - frombit in (2, -2):
+            flag = PACKED_CASTLE_KING if tobit > frombit else PACKED_CASTLE_QUEEN
+        else:
+            flag = PACKED_QUIET
+        return frombit | tobit << 6 | flag << 12
+
+    def __record(self, move, antimove):
+        """
+        Atualiza o estado do jogo (histórico, direitos de roque, "en passant", contadores, hash) depois
+        que `move` foi feito no tabuleiro
+        """
+        if self.counters is not None:
+            self.counters.make += 1
+        self.__history.append(self.Snapshot(self.__turn, self.__context.can_castle.copy(),
+                                            self.__context.ep, antimove, self.__statekey,
+                                            self.__halfmove))
+        fromindex = Board._index(move.fromsq)
+        toindex = Board._index(move.tosq)
+        can_castle = self.__context.can_castle
+        turn = self.__turn
+        opponent = turn.opponent()
         # castling
-        kind = self.__board[move.tosq].kind
+        kind = self.__board[toindex].kind
         if kind is King:
-            self.__context.can_castle[self.__turn] = (False, False)
+            can_castle[turn] = (False, False)
         # queen side
-        elif self.__context.can_castle[self.__turn][0] and Square(move.fromsq) == Square(
-                'a' + self.initialrank[self.__turn]):
-            self.__context.can_castle[self.__turn] = (False, self.__context.can_castle[self.__turn][1])
+        elif can_castle[turn][0] and fromindex == self.ROOK_SQUARES[turn][0]:
+            can_castle[turn] = (False, can_castle[turn][1])
         # king side
-        elif self.__context.can_castle[self.__turn][1] and Square(move.fromsq) == Square(
-                'h' + self.initialrank[self.__turn]):
-            self.__context.can_castle[self.__turn] = (self.__context.can_castle[self.__turn][0], False)
+        elif can_castle[turn][1] and fromindex == self.ROOK_SQUARES[turn][1]:
+            can_castle[turn] = (can_castle[turn][0], False)
+        # rook captured on its initial square
+        capture = move.kind in CAPTURE_KINDS
+        if capture:
+            if can_castle[opponent][0] and toindex == self.ROOK_SQUARES[opponent][0]:
+                can_castle[opponent] = (False, can_castle[opponent][1])
+            elif can_castle[opponent][1] and toindex == self.ROOK_SQUARES[opponent][1]:
+                can_castle[opponent] = (can_castle[opponent][0], False)
         # en passant
-        ep = (move.fromsq + move.tosq) / 2 if move.kind is MoveKind.PAWN2 else None
-        self.__context = self.__context._replace(ep=ep)
-        self.__turn = self.__turn.opponent()
-        if move.kind in (MoveKind.CAPTURE, MoveKind.EP_CAPTURE, MoveKind.PROMOTION_CAPTURE):
+        ep = INDEX_SQUARES[(fromindex + toindex) // 2] if move.kind is MoveKind.PAWN2 else None
+        if ep is not None or self.__context.ep is not None:
+            self.__context = self.__context._replace(ep=ep)
+        # contadores de lances
+        if capture or kind is Pawn or move.promotion is not None:
+            self.__halfmove = 0
+        else:
+            self.__halfmove += 1
+        if turn is Side.BLACK:
+            self.__fullmove += 1
+        self.__turn = opponent
+        self.__statekey = self.__state_key()
+        key = self.__board.zobrist() ^ self.__statekey
+        self.__repetitions[key] = self.__repetitions.get(key, 0) + 1
+        self.__status = None
+        self.__ucimoves = None
+        if capture:
             return antimove.addpiece, antimove.addpos
         else:
-            return NoPiece(), None
+            return _NO_PIECE, None
 
     def unmake(self):
         """
@@ -1135,11 +2988,340 @@ class Game:
         """
         if len(self.__history) == 0:
             raise RuntimeError('Tried to unmake a move, but no moves had been made previously')
+        if self.counters is not None:
+            self.counters.unmake += 1
+        key = self.hash()
+        if self.__repetitions[key] == 1:
+            del self.__repetitions[key]
+        else:
+            self.__repetitions[key] -= 1
         last = self.__history.pop()
         last.antimove.kind.exec(
             last.antimove, self.__board.movepiece, self.__board.addpiece, self.__board.removepiece)
-        self.__context = self.__context._replace(ep=last.ep, can_castle=last.can_castle)
+        self.__context = self.__context._replace(ep=last.ep, can_castle=dict(last.can_castle))
         self.__turn = last.turn
+        self.__statekey = last.key
+        self.__status = None
+        self.__ucimoves = None
+        self.__halfmove = last.halfmove
+        if last.turn is Side.BLACK:
+            self.__fullmove -= 1
+
+    def evaluate(self):
+        """
+        Avaliação estática da posição (material e tabelas peça-casa, ponderados pela fase do jogo; ver
+        `Board.evaluation`). É O(1): o tabuleiro a mantém a cada movimento
+        :return: Avaliação em centipeões, do ponto de vista do jogador da vez
+        """
+        score = self.__board.evaluation()
+        return score if self.__turn is Side.WHITE else -score
+
+    def see(self, move):
+        """
+        Avaliação estática de trocas ("static exchange evaluation"): o material que o jogador da vez
+        ganha com `move` se, depois dele, os dois jogadores capturarem alternadamente na casa de destino,
+        sempre com a peça menos valiosa (ver `Board.attackers`), cada um podendo parar quando continuar não
+        lhe convém. Nada é feito no tabuleiro. Cravadas e xeques são ignorados, e o peão capturado "en
+        passant" não abre linhas
+        :param move: Como em `make_unchecked` (um movimento legal na posição)
+        :return: Ganho em centipeões (negativo se o movimento perde material), pelos valores de
+        `evaltables`
+        """
+        code = self.__code(move)
+        flag = code >> 12
+        if flag == PACKED_CASTLE_KING or flag == PACKED_CASTLE_QUEEN:
+            return 0
+        board = self.__board
+        values = self.evaltables.values
+        fromindex, index = PACKED_INDEX[code & 63], PACKED_INDEX[code >> 6 & 63]
+        piece = board[fromindex]
+        side = piece.side
+        enemy = side.opponent()
+        pawn, queen = SIDE_PIECES[side][0], SIDE_PIECES[side][4]
+        if flag == PACKED_EP_CAPTURE:
+            gain = values[SIDE_PIECES[enemy][0]]
+        else:
+            target = board[index]
+            gain = 0 if target.side is None else values[target]
+        if flag & PACKED_PROMOTION:
+            piece = PACKED_PROMOTIONS[flag & 3](side)
+            gain += values[piece] - values[pawn]
+        # Um peão que captura na última fileira é promovido a rainha
+        promotes = INDEX_RANKS[index] in (1, 8)
+        queues = board._attack_lines(index, (fromindex,))
+        gains = [gain]
+        victim = SEE_KING_VALUE if piece.kind is King else values[piece]
+        turn = enemy
+        source = board._pop_attacker(queues, turn)
+        while source is not None:
+            piece = board[source]
+            gains.append(victim - gains[-1])
+            if piece.kind is King:
+                victim = SEE_KING_VALUE
+            elif piece.kind is Pawn and promotes:
+                gains[-1] += values[queen] - values[pawn]
+                victim = values[queen]
+            else:
+                victim = values[piece]
+            turn = turn.opponent()
+            source = board._pop_attacker(queues, turn)
+        # Cada jogador, do último ao primeiro, escolhe entre capturar e parar
+        while len(gains) > 1:
+            last = gains.pop()
+            gains[-1] = min(gains[-1], -last)
+        return gains[0]
+
+    def set_evaltables(self, evaltables):
+        """
+        Troca as tabelas usadas por `evaluate` neste jogo
+        :param evaltables: Instância de `EvalTables`
+        """
+        self.evaltables = evaltables
+        self.__board.set_evaltables(evaltables)
+
+    def copy(self, history=True):
+        """
+        Cria um jogo independente na mesma posição, copiando o tabuleiro (sem refazer os movimentos do
+        histórico). Movimentos feitos em um dos jogos não afetam o outro
+        :param history: Se `False`, a cópia não tem histórico (não é possível chamar `unmake` nela
+        antes de fazer algum movimento)
+        :return: Instância de `Game`
+        """
+        game = object.__new__(self.__class__)
+        game.__dict__.update(self.__dict__)
+        game.__board = self.__board.copy()
+        game.__context = self.__context._replace(kings=dict(self.__context.kings),
+                                                 can_castle=dict(self.__context.can_castle))
+        game.__history = deque(self.__history) if history else deque()
+        game.__repetitions = dict(self.__repetitions)
+        return game
+
+    def hash(self):
+        """
+        Hash Zobrist (inteiro de 64 bits) da posição atual: peças, direitos de roque, casa "en passant"
+        e jogador da vez. Duas posições iguais têm o mesmo hash, em qualquer processo. É atualizado
+        incrementalmente por `make` e `unmake`, então consultá-lo é O(1)
+        """
+        return self.__board.zobrist() ^ self.__statekey
+
+    def __state_key(self, board=None, turn=None, can_castle=None, ep=None):
+        """
+        :return: Parte do hash Zobrist que não depende das peças. A casa "en passant" só entra no hash
+        se algum peão do jogador da vez estiver em posição de capturar nela (senão, posições iguais
+        teriam hashes diferentes só por causa de um avanço duplo de peão).
+
+        Sem argumentos, é a da posição atual; `restore_repetitions` passa os de posições anteriores
+        """
+        if board is None:
+            board, turn = self.__board, self.__turn
+            can_castle, ep = self.__context.can_castle, self.__context.ep
+        key = 0
+        for side, (queenside, kingside) in can_castle.items():
+            if queenside:
+                key ^= ZOBRIST_CASTLE[side][0]
+            if kingside:
+                key ^= ZOBRIST_CASTLE[side][1]
+        if ep is not None:
+            ep = Board._index(ep)
+            pawn = SIDE_PIECES[turn][0]
+            for offset in Pawn.attackoffsets[turn]:
+                if board[ep - offset] is pawn:
+                    key ^= ZOBRIST_EP[ep % 15 - 3]
+                    break
+        if turn is Side.BLACK:
+            key ^= ZOBRIST_BLACK
+        return key
+
+    def is_threefold(self):
+        """
+        Regra da tripla repetição. A contagem é mantida em O(1) por `make` e `unmake`, pelo hash de
+        cada posição (ver `hash`)
+        :return: Se a posição atual já ocorreu 3 vezes ou mais (contando a atual)
+        """
+        return self.__repetitions.get(self.hash(), 0) >= 3
+
+    def is_fifty_move(self):
+        """
+        Regra dos 50 lances
+        :return: Se foram feitos 100 meio-lances ou mais sem captura nem movimento de peão
+        """
+        return self.__halfmove >= 100
+
+    def insufficient_material(self):
+        """
+        Nenhum dos jogadores tem material para dar xequemate, em qualquer sequência de movimentos: não há
+        peões, torres nem rainhas e só resta no máximo uma peça menor (cavalo ou bispo), ou só restam
+        bispos, todos em casas da mesma cor. É O(1) (ver `Board.count`)
+        """
+        count = self.__board.count
+        for side in Side:
+            pawn, knight, bishop, rook, queen, king = SIDE_PIECES[side]
+            if count(pawn) or count(rook) or count(queen):
+                return False
+        knights = count(SIDE_PIECES[Side.WHITE][1]) + count(SIDE_PIECES[Side.BLACK][1])
+        light, dark = self.__board.bishopcolors()
+        return knights + light + dark <= 1 or (knights == 0 and (light == 0 or dark == 0))
+
+    def can_mate(self, side):
+        """
+        Se o jogador `side` tem material para dar xequemate com a ajuda do adversário (usado para decidir
+        se quem perde por tempo perde ou empata). Com uma única peça menor, só é possível se o adversário
+        tiver alguma peça além do rei (que possa bloquear a fuga do próprio rei)
+        :param side: Do tipo `Side`
+        """
+        if self.insufficient_material():
+            return False
+        count = self.__board.count
+        pawn, knight, bishop, rook, queen, king = SIDE_PIECES[side]
+        if count(pawn) or count(rook) or count(queen):
+            return True
+        minors = count(knight) + count(bishop)
+        if minors == 1:
+            return any(count(piece) for piece in SIDE_PIECES[side.opponent()][:5])
+        return minors > 1
+
+    def probe_endgame(self):
+        """
+        Consulta as bitbases (ver `bitbases`) nos finais de rei contra rei sozinho que elas cobrem (KQK,
+        KRK, KPK e KBNK). A posição é espelhada verticalmente se o lado forte for o das pretas
+        :return: 'win', 'draw' ou 'loss', do ponto de vista do jogador da vez, com jogo perfeito dos
+        dois lados; ou None se não há bitbase para o material da posição
+        """
+        if self.bitbases is None:
+            return None
+        squares = {side: self.__board.occuppied(side) for side in Side}
+        if len(squares[Side.WHITE]) + len(squares[Side.BLACK]) > 4:
+            return None
+        strong = Side.WHITE if len(squares[Side.BLACK]) == 1 else Side.BLACK
+        if len(squares[strong.opponent()]) != 1:
+            return None
+        mirror = 56 if strong is Side.BLACK else 0
+        pieces = []
+        for square in squares[strong]:
+            letter = self.FEN_LETTERS[self.__board[square].kind].upper()
+            pieces.append((letter, BitBoard.TO64[square.index] ^ mirror))
+        pieces.sort(key=lambda piece: 'KQRBNP'.index(piece[0]))
+        name = ''.join(letter for letter, bit in pieces) + 'K'
+        weak_king = BitBoard.TO64[squares[strong.opponent()][0].index] ^ mirror
+        wins = self.bitbases.probe(name, self.__turn is strong,
+                                   [pieces[0][1], weak_king] + [bit for letter, bit in pieces[1:]])
+        if wins is None:
+            return None
+        if not wins:
+            return 'draw'
+        return 'win' if self.__turn is strong else 'loss'
+
+    def restore_repetitions(self, history):
+        """
+        Reconstrói a contagem de repetições de um jogo criado a partir da posição atual (`from_fen`),
+        que só conhece essa posição. Só as posições desde a última captura ou movimento de peão (ver
+        `is_fifty_move`) podem se repetir, e os movimentos entre elas não capturam nem movem peões:
+        eles são desfeitos, do último para o primeiro, numa cópia do tabuleiro.
+
+        Os direitos de roque de cada posição anterior são deduzidos do histórico: um direito se perde
+        no primeiro movimento que sai da casa inicial do rei ou da torre, ou que chega à da torre
+        :param history: Lista com as strings de todos os movimentos feitos desde a posição inicial até a
+        posição atual (como em `ChessGame.history`)
+        """
+        # { [(jogador, 0 (lado da rainha) ou 1 (lado do rei))]: meio-lance em que o direito se perdeu }
+        lost = {}
+        for ply, movestr in enumerate(history):
+            fromindex = Square(movestr[0:2]).index
+            toindex = Square(movestr[2:4]).index
+            for side in Side:
+                for wing in (0, 1):
+                    rook = self.ROOK_SQUARES[side][wing]
+                    if (side, wing) not in lost and (
+                            fromindex == self.KING_SQUARES[side] or rook in (fromindex, toindex)):
+                        lost[side, wing] = ply
+        board = self.__board.copy()
+        turn = self.__turn
+        repetitions = {self.hash(): 1}
+        first = len(history) - min(self.__halfmove, len(history))
+        for index in range(len(history) - 1, first - 1, -1):
+            fromindex = Square(history[index][0:2]).index
+            toindex = Square(history[index][2:4]).index
+            if board[toindex].kind is King and abs(toindex - fromindex) == 2:
+                # roque: a torre volta também
+                rook = self.ROOK_SQUARES[turn.opponent()][1 if toindex > fromindex else 0]
+                board.movepiece((fromindex + toindex) // 2, rook)
+            board.movepiece(toindex, fromindex)
+            turn = turn.opponent()
+            # Posição antes de `history[index]`
+            can_castle = {side: tuple(lost.get((side, wing), index) >= index for wing in (0, 1))
+                          for side in Side}
+            # Só a primeira posição, logo após um movimento de peão, pode ter casa "en passant"
+            ep = None
+            if index == first and index > 0:
+                pawnfrom = Square(history[index - 1][0:2]).index
+                pawnto = Square(history[index - 1][2:4]).index
+                if board[pawnto].kind is Pawn and abs(pawnto - pawnfrom) == 30:
+                    ep = INDEX_SQUARES[(pawnfrom + pawnto) // 2]
+            key = board.zobrist() ^ self.__state_key(board, turn, can_castle, ep)
+            repetitions[key] = repetitions.get(key, 0) + 1
+        self.__repetitions = repetitions
+
+    def perft(self, depth, workers=1):
+        """
+        Conta os nós folha da árvore de movimentos legais a partir da posição atual, até a
+        profundidade `depth` (teste de corretude e velocidade de `moves`, `make` e `unmake`). Não
+        consulta `movecache`, para que a contagem meça de fato a geração de movimentos
+        :param depth: Profundidade (em meio-lances) da árvore. Deve ser >= 0
+        :param workers: Número de processos. Se > 1, cada movimento da posição atual é contado num
+        processo separado (ver `split_perft`). O resultado é o mesmo
+        :return: Número de posições alcançáveis com exatamente `depth` meio-lances
+        """
+        if workers > 1 and depth > 1:
+            return sum(self.split_perft(depth, workers).values())
+        if depth == 0:
+            return 1
+        moves = self.__legalmoves()
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for move in moves:
+            self.make_unchecked(move)
+            nodes += self.perft(depth - 1)
+            self.unmake()
+        return nodes
+
+    def divide(self, depth, workers=1):
+        """
+        Igual a `perft`, mas separa a contagem por movimento da posição atual. Útil para encontrar,
+        comparando com outra engine, qual movimento leva a uma contagem errada
+        :param depth: Profundidade (em meio-lances) da árvore. Deve ser >= 1
+        :param workers: Número de processos (ver `split_perft`)
+        :return: Dicionário. Chave: String do movimento (ver `deflate`). Valor: `perft(depth - 1)` da
+        posição após o movimento
+        """
+        if depth < 1:
+            raise ValueError('divide depth must be at least 1')
+        if workers > 1:
+            return {self.deflate(code): nodes
+                    for code, nodes in self.split_perft(depth, workers).items()}
+        counts = {}
+        for move in self.__legalmoves():
+            self.make_unchecked(move)
+            counts[self.deflate(move)] = self.perft(depth - 1)
+            self.unmake()
+        return counts
+
+    def split_perft(self, depth, workers):
+        """
+        Distribui os movimentos da posição atual entre `workers` processos. Cada tarefa recebe só a
+        posição em FEN, o movimento compactado (ver `pack_move`) e o nome do backend, e devolve
+        `perft(depth - 1)` da posição após o movimento
+        :param depth: Profundidade (em meio-lances) da árvore. Deve ser >= 1
+        :param workers: Número máximo de processos
+        :return: Dicionário. Chave: Movimento compactado. Valor: Número de nós abaixo dele
+        """
+        fen = self.to_fen()
+        backend = self.backend()
+        codes = list(self.packed_moves())
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            counts = executor.map(_perft_task, [fen] * len(codes), [backend] * len(codes), codes,
+                                  [depth - 1] * len(codes))
+            return dict(zip(codes, counts))
 
     def getboard(self):
         """
@@ -1147,3 +3329,13 @@ class Game:
         :return: Representação interna do tabuleiro de jogo
         """
         return self.__board
+
+
+def _perft_task(fen, backend, code, depth):
+    """
+    Tarefa executada nos processos de `Game.split_perft`
+    :return: `perft(depth)` da posição `fen` após o movimento compactado `code`
+    """
+    game = Game.from_fen(fen, backend=backend)
+    game.make_unchecked(code)
+    return game.perft(depth)
@@ -1,10 +1,24 @@
 from datetime import datetime
 from threading import Timer
 
+from chessgames.common.chessengine import Game, Side
 from chessgames.common.group_msgs import GroupMsgs, group_send
 from chessgames.models import ChessGame
 
 
+def __can_mate(game, player):
+    """
+    :param player: 'white' or 'black'
+    :return: Whether `player` has enough material left to checkmate in the ChessGame `game`
+    """
+    if game.fen:
+        engine = Game.from_fen(game.fen, backend='bitboard')
+    else:
+        engine = Game.default_game(backend='bitboard')
+        engine.replay(game.history)
+    return engine.can_mate(Side.WHITE if player == 'white' else Side.BLACK)
+
+
 def __win_by_timer(game_id, move_count, winning_player):
     try:
         game = ChessGame.objects.get(pk=game_id)
@@ -18,6 +32,10 @@ def __win_by_timer(game_id, move_count, winning_player):
     if (game.win in ('white', 'black', 'draw')):
         return
 
+    # The player who ran out of time does not lose if the opponent could never checkmate
+    if not __can_mate(game, winning_player):
+        winning_player = 'draw'
+
     game.win = winning_player
     game.end = datetime.now()
     game.alive = False
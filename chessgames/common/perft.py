@@ -0,0 +1,96 @@
+"""
+Standard perft positions for checking the correctness and measuring the speed of the chess engine
+(`Game.moves`, `Game.make` and `Game.unmake`).
+
+Node counts come from the usual published perft tables (chessprogramming.org "Perft Results" and
+the TalkChess edge-case collection). Refer to `manage.py perft`
+"""
+import time
+from collections import namedtuple
+
+from chessgames.common.chessengine import Game
+
+"""
+- name: Short identifier of the position
+- fen: The position in FEN
+- nodes: Tuple with the expected perft counts. nodes[0] is the count at depth 1, and so on
+"""
+PerftPosition = namedtuple('PerftPosition', 'name fen nodes')
+
+"""
+- expected: Expected node count, or None if the suite does not know the count at this depth
+- seconds: Wall time spent by `Game.perft`
+- nps: Nodes per second
+"""
+PerftResult = namedtuple('PerftResult', 'name fen depth nodes expected seconds nps')
+
+PERFT_SUITE = (
+    PerftPosition('initial', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+                  (20, 400, 8902, 197281, 4865609)),
+    PerftPosition('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+                  (48, 2039, 97862, 4085603)),
+    PerftPosition('position3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+                  (14, 191, 2812, 43238, 674624)),
+    PerftPosition('position4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+                  (6, 264, 9467, 422333)),
+    PerftPosition('position5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+                  (44, 1486, 62379, 2103487)),
+    PerftPosition('position6',
+                  'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+                  (46, 2079, 89890, 3894594)),
+    # En passant, promotion and castling edge cases
+    PerftPosition('illegal_ep_1', '3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1',
+                  (18, 92, 1670, 10138, 185429, 1134888)),
+    PerftPosition('illegal_ep_2', '8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1',
+                  (13, 102, 1266, 10276, 135655, 1015133)),
+    PerftPosition('ep_gives_check', '8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1',
+                  (15, 126, 1928, 13931, 206379, 1440467)),
+    PerftPosition('short_castle_check', '5k2/8/8/8/8/8/8/4K2R w K - 0 1',
+                  (15, 66, 1198, 6399, 120330, 661072)),
+    PerftPosition('long_castle_check', '3k4/8/8/8/8/8/8/R3K3 w Q - 0 1',
+                  (16, 71, 1286, 7418, 141077, 803711)),
+    PerftPosition('castle_rights', 'r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1',
+                  (26, 1141, 27826, 1274206)),
+    PerftPosition('castle_prevented', 'r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1',
+                  (44, 1494, 50509, 1720476)),
+    PerftPosition('promote_out_of_check', '2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1',
+                  (11, 133, 1442, 19174, 266199, 3821001)),
+    PerftPosition('discovered_check', '8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1',
+                  (29, 165, 5160, 31961, 1004658)),
+    PerftPosition('promote_gives_check', '4k3/1P6/8/8/8/8/K7/8 w - - 0 1',
+                  (9, 40, 472, 2661, 38983, 217342)),
+    PerftPosition('underpromote_check', '8/P1k5/K7/8/8/8/8/8 w - - 0 1',
+                  (6, 27, 273, 1329, 18135, 92683)),
+    PerftPosition('self_stalemate', 'K1k5/8/P7/8/8/8/8/8 w - - 0 1',
+                  (2, 6, 13, 63, 382, 2217)),
+    PerftPosition('stalemate_checkmate_1', '8/k1P5/8/1K6/8/8/8/8 w - - 0 1',
+                  (10, 25, 268, 926, 10857, 43261, 567584)),
+    PerftPosition('stalemate_checkmate_2', '8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1',
+                  (37, 183, 6559, 23527)),
+)
+
+
+def run_perft(position, depth, backend='mailbox', workers=1):
+    """
+    Runs `Game.perft` on a single position
+    :param position: A `PerftPosition`
+    :param depth: perft depth (plies)
+    :param backend: Board backend (see `Game.BACKENDS`)
+    :param workers: Number of processes the root moves are split across (see `Game.split_perft`)
+    :return: A `PerftResult`
+    """
+    game = Game.from_fen(position.fen, backend=backend)
+    start = time.perf_counter()
+    nodes = game.perft(depth, workers)
+    seconds = time.perf_counter() - start
+    expected = position.nodes[depth - 1] if 0 < depth <= len(position.nodes) else None
+    return PerftResult(position.name, position.fen, depth, nodes, expected, seconds,
+                       nodes / seconds if seconds > 0 else 0.0)
+
+
+def run_suite(depth, positions=PERFT_SUITE, backend='mailbox', workers=1):
+    """
+    Runs `run_perft` over every position
+    :return: List of `PerftResult`
+    """
+    return [run_perft(position, depth, backend, workers) for position in positions]
@@ -0,0 +1,300 @@
+"""
+Move search for the computer opponent: alpha-beta (negamax) with iterative deepening, move
+ordering (previous best move, MVV-LVA captures, killer moves, then captures that lose material) and a
+quiescence search of the captures that do not lose material (see `Game.see`), stopped by a hard
+deadline. In the endings covered by the bitbases, only the moves that keep the
+bitbase result are searched.
+
+`best_move` is the entry point run in the bot's worker processes (see `chessgames.common.bot`). It
+only needs a FEN, so a position is cheap to send to another process. It plays from the opening book
+when the position is in it
+"""
+import time
+from collections import namedtuple
+
+from chessgames.common.book import choose, open_book
+from chessgames.common.chessengine import (
+    Bishop, Game, King, Knight, Pawn, Square, PACKED_CAPTURE, PACKED_EP_CAPTURE, PACKED_INDEX,
+    PACKED_PROMOTION, PACKED_PROMOTION_CAPTURE, PACKED_PROMOTIONS, packed_to_uci
+)
+
+"""
+- move: Best move found (string, see `Game.make`), or None if the side to move has no legal move
+- score: Score of `move` in centipawns, from the point of view of the side to move (None if the
+  deadline passed before any move was searched)
+- depth: Depth (plies) of the last completed iteration
+- nodes: Positions visited
+- seconds: Wall time spent
+"""
+SearchResult = namedtuple('SearchResult', 'move score depth nodes seconds')
+
+# Captures (en passant included) and promotions have one of these bits set in their packed flag
+TACTICAL_FLAGS = PACKED_CAPTURE | PACKED_PROMOTION
+MATE = 100000
+# The deadline is checked once every this many nodes
+CHECK_EVERY = 256
+MAX_DEPTH = 64
+# Endings won according to the bitbases: bonus (centipawns) per step the lone king is pushed towards
+# the edge, and per step the kings get closer, so that the search makes progress towards mate
+MOPUP_EDGE = 10
+MOPUP_KINGS = 4
+SQUARE_NAMES = tuple(file + rank for rank in '12345678' for file in 'abcdefgh')
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Search:
+    """
+    State of one search (a single call of `search`). Scores are in centipawns from the point of view of
+    the side to move. Positions are scored with `Game.evaluate`
+    """
+
+    def __init__(self, game, deadline):
+        self.game = game
+        self.deadline = deadline
+        self.values = game.evaltables.values
+        self.nodes = 0
+        self.best = {}  # { [Game.hash()]: best packed move found in that position }
+        self.killers = {}  # { [ply]: packed quiet move that caused a cutoff at that ply }
+        self.strong = None  # Side winning a lone king ending (see `evaluate`), if the search is in one
+        self.corners = None  # See `mopup`
+
+    def evaluate(self):
+        """
+        `Game.evaluate`, plus the mop-up bonus of the side winning a lone king ending
+        """
+        score = self.game.evaluate()
+        if self.strong is None:
+            return score
+        bonus = mopup(self.game.king(self.strong), self.game.king(self.strong.opponent()),
+                      self.corners)
+        return score + bonus if self.game.turn() is self.strong else score - bonus
+
+    def gain(self, code):
+        """
+        :return: Material won by the side to move with the packed move `code`
+        """
+        flag = code >> 12
+        gain = 0
+        if flag == PACKED_EP_CAPTURE:
+            return self.values[Pawn(self.game.turn())]
+        if flag == PACKED_CAPTURE or flag & PACKED_PROMOTION_CAPTURE == PACKED_PROMOTION_CAPTURE:
+            gain = self.values[self.game.get(PACKED_INDEX[code >> 6 & 63])]
+        if flag & PACKED_PROMOTION:
+            turn = self.game.turn()
+            gain += self.values[PACKED_PROMOTIONS[flag & 3](turn)] - self.values[Pawn(turn)]
+        return gain
+
+    def order(self, codes, ply, losing=True):
+        """
+        :param losing: Whether captures and promotions that lose material in the exchange that follows
+        them (see `Game.see`) are kept
+        :return: `codes` sorted with the best move found earlier in this position first, then captures
+        and promotions that do not lose material (most valuable victim, least valuable attacker), then
+        the killer move, then the losing captures (the least losing first), then the other moves
+        """
+        best = self.best.get(self.game.hash())
+        killer = self.killers.get(ply)
+        keys = {}
+        for code in codes:
+            if code == best:
+                keys[code] = -2 * MATE
+            elif code >> 12 & TACTICAL_FLAGS:
+                exchange = self.game.see(code)
+                if exchange >= 0:
+                    keys[code] = -10 * self.gain(code) + \
+                        self.values[self.game.get(PACKED_INDEX[code & 63])] // 100
+                elif losing:
+                    keys[code] = -exchange
+            elif code == killer:
+                keys[code] = 0
+            else:
+                keys[code] = MATE
+        return sorted((code for code in codes if code in keys), key=keys.__getitem__)
+
+    def tick(self):
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0 and time.time() >= self.deadline:
+            raise SearchTimeout()
+
+    def quiescence(self, alpha, beta, ply):
+        """
+        Searches captures and promotions only, so that the position is evaluated when it is quiet
+        """
+        self.tick()
+        static = self.evaluate()
+        if static >= beta:
+            return static
+        alpha = max(alpha, static)
+        codes = self.game.packed_moves()
+        if not codes:
+            return -MATE + ply if self.game.check() else 0
+        tactical = [code for code in codes if code >> 12 & TACTICAL_FLAGS]
+        for code in self.order(tactical, ply, losing=False):
+            self.game.make_unchecked(code)
+            score = -self.quiescence(-beta, -alpha, ply + 1)
+            self.game.unmake()
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+    def negamax(self, depth, alpha, beta, ply):
+        if depth == 0:
+            return self.quiescence(alpha, beta, ply)
+        self.tick()
+        # A draw can be claimed (see `Game.is_threefold`)
+        if self.game.is_threefold() or self.game.is_fifty_move():
+            return 0
+        codes = self.game.packed_moves()
+        if not codes:
+            return -MATE + ply if self.game.check() else 0
+        best_score = -2 * MATE
+        best_code = None
+        for code in self.order(codes, ply):
+            self.game.make_unchecked(code)
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            self.game.unmake()
+            if score > best_score:
+                best_score, best_code = score, code
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not code >> 12 & TACTICAL_FLAGS:
+                    self.killers[ply] = code
+                break
+        self.best[self.game.hash()] = best_code
+        return best_score
+
+    def root(self, depth, codes):
+        """
+        Searches every root move to `depth` plies
+        :return: Tuple (best move, its score). If the deadline passes, `SearchTimeout` carries the best
+        move found so far in the iteration (`args[0]`, None if not even the first move was searched)
+        """
+        alpha = -2 * MATE
+        best = None
+        for code in codes:
+            self.game.make_unchecked(code)
+            try:
+                score = -self.negamax(depth - 1, -2 * MATE, -alpha, 1)
+            except SearchTimeout:
+                raise SearchTimeout(best)
+            finally:
+                self.game.unmake()
+            if score > alpha:
+                alpha, best = score, (code, score)
+        return best
+
+
+# Result of a position for the side to move (see `Game.probe_endgame`). Positions left by a capture
+# or an underpromotion are outside the bitbases, and draws
+ENDGAME_RANK = {'win': 1, 'draw': 0, None: 0, 'loss': -1}
+
+
+def coordinates(square):
+    """
+    :return: Tuple (file, rank) of a `Square`, both from 0 to 7
+    """
+    return ord(square.name[0]) - ord('a'), square.rank - 1
+
+
+def mopup(strong_king, weak_king, corners=None):
+    """
+    :param corners: Coordinates of the corners the lone king has to be driven to (with bishop and
+    knight, the two of the bishop's colour), or None if any edge will do
+    :return: Mop-up bonus (see `MOPUP_EDGE`) for the given king squares
+    """
+    weak_file, weak_rank = coordinates(weak_king)
+    strong_file, strong_rank = coordinates(strong_king)
+    if corners is None:
+        edge = max(3 - weak_file, weak_file - 4) + max(3 - weak_rank, weak_rank - 4)
+    else:
+        edge = 14 - min(abs(weak_file - file) + abs(weak_rank - rank) for file, rank in corners)
+    distance = abs(weak_file - strong_file) + abs(weak_rank - strong_rank)
+    return MOPUP_EDGE * edge + MOPUP_KINGS * (14 - distance)
+
+
+def mating_corners(game, side):
+    """
+    :return: Corners (see `mopup`) the lone king has to be driven to by the pieces of `side`
+    """
+    pieces = [(game.get(name).kind, name) for name in SQUARE_NAMES
+              if game.get(name).side is side and game.get(name).kind is not King]
+    if len(pieces) != 2 or {kind for kind, name in pieces} != {Bishop, Knight}:
+        return None
+    file, rank = coordinates(Square(next(name for kind, name in pieces if kind is Bishop)))
+    if (file + rank) % 2 == 0:
+        return (0, 0), (7, 7)
+    return (0, 7), (7, 0)
+
+
+def endgame_moves(game, codes):
+    """
+    :return: The moves among `codes` that keep the result given by the endgame bitbases, or `codes` if
+    the position is not in them
+    """
+    if game.probe_endgame() is None:
+        return codes
+    ranks = {}
+    for code in codes:
+        game.make_unchecked(code)
+        ranks[code] = -ENDGAME_RANK[game.probe_endgame()]
+        game.unmake()
+    best = max(ranks.values())
+    return [code for code in codes if ranks[code] == best]
+
+
+def search(game, deadline, max_depth=MAX_DEPTH):
+    """
+    Iterative deepening: searches 1, 2, 3... plies deep until `max_depth` or the deadline. The game is
+    not changed (the search works on a copy)
+    :param game: Instance of `Game`
+    :param deadline: Wall clock time (`time.time()`) at which the search stops. Even if it has already
+    passed, a legal move is returned
+    :param max_depth: Maximum depth (plies)
+    :return: A `SearchResult`
+    """
+    start = time.time()
+    state = Search(game.copy(history=False), deadline)
+    codes = list(state.game.packed_moves())
+    if not codes:
+        return SearchResult(None, -MATE if game.check() else 0, 0, 0, time.time() - start)
+    if state.game.probe_endgame() == 'win':
+        state.strong = state.game.turn()
+        state.corners = mating_corners(state.game, state.strong)
+    codes = state.order(endgame_moves(state.game, codes), 0)
+    best, depth = (codes[0], None), 0
+    try:
+        while depth < max_depth:
+            code, score = state.root(depth + 1, codes)
+            best, depth = (code, score), depth + 1
+            # Next iteration starts with the best move of this one
+            codes.remove(code)
+            codes.insert(0, code)
+            if abs(score) >= MATE - MAX_DEPTH:
+                break
+    except SearchTimeout as timeout:
+        if timeout.args[0] is not None:
+            best = timeout.args[0]
+    return SearchResult(packed_to_uci(best[0]), best[1], depth, state.nodes, time.time() - start)
+
+
+def best_move(fen, history, deadline, backend='bitboard', book=None):
+    """
+    Runs `search` on the position `fen` (meant to run in a worker process), unless the opening book has
+    moves for it
+    :param history: Moves played since the initial position, so that repetitions are known (see
+    `Game.restore_repetitions`)
+    :param book: Path of the opening book file (see `chessgames.common.book`), or None
+    :return: Best move string, or None if there is no legal move
+    """
+    game = Game.from_fen(fen, backend=backend)
+    if book is not None:
+        moves = open_book(book).lookup(game.hash())
+        if moves:
+            return choose(moves)
+    game.restore_repetitions(history)
+    return search(game, deadline).move
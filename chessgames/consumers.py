@@ -1,13 +1,26 @@
+import logging
+import time
 from datetime import datetime
 
 from channels.consumer import async_to_sync
 from channels.generic.websocket import JsonWebsocketConsumer
+from django.conf import settings
 
-from chessgames.common.chessengine import Game
+from chessgames.common.bitbases import Bitbases
+from chessgames.common.bot import is_bot, request_bot_move
+from chessgames.common.chessengine import EngineCounters, Game, MOVE_CACHE
 from chessgames.common.group_msgs import GroupMsgs
 from chessgames.common.move_timer import run_timer
 from chessgames.models import ChessGame
 
+MOVE_CACHE.resize(settings.CHESS_MOVE_CACHE_BYTES)
+Game.bitbases = Bitbases(settings.CHESS_BITBASE_DIR)
+if settings.CHESS_ENGINE_STATS:
+    Game.counters = EngineCounters()
+    Game.set_timing_hook(Game.counters.record)
+
+logger = logging.getLogger(__name__)
+
 
 class ServerMsgs:
     """
@@ -91,9 +104,19 @@ class ChessGameConsumer(JsonWebsocketConsumer):
         self.reset_engine()
 
     def reset_engine(self):
-        self.engine = Game.default_game()
-        for move in self.game_inst.history:
-            self.engine.make(move)
+        """
+        Restores the engine from the position snapshot (ChessGame.fen). The whole history is only
+        replayed for games without a snapshot, or with one that does not match the history
+        """
+        if self.game_inst.fen:
+            engine = Game.from_fen(self.game_inst.fen, backend='bitboard')
+            if engine.ply() == len(self.game_inst.history):
+                engine.restore_repetitions(self.game_inst.history)
+                self.engine = engine
+                return
+        self.engine = Game.default_game(backend='bitboard')
+        # Moves in history were validated when played
+        self.engine.replay(self.game_inst.history)
 
     def disconnect(self, close_code):
         # Leave room group
@@ -114,26 +137,35 @@ class ChessGameConsumer(JsonWebsocketConsumer):
         self.accept_draw_validity = False
 
         # Validate and execute
+        if not isinstance(move, str):
+            return
         try:
             self.engine.make(move)
         except:
             return
 
         self.game_inst.history.append(move)
+        self.game_inst.fen = self.engine.to_fen()
         self.game_inst.save()
 
         me = 'white' if self.is_first_player else 'black'
+        status = self.engine.status()
+        # Endings decided according to the bitbases, from the opponent's point of view
+        endgame = self.engine.probe_endgame() if settings.CHESS_ADJUDICATE_ENDGAMES else None
 
-        if self.engine.checkmate():
+        if status.checkmate or endgame in ('win', 'loss'):
+            winner = me if status.checkmate or endgame == 'loss' else \
+                ('black' if self.is_first_player else 'white')
             self.game_inst.end = datetime.now()
-            self.game_inst.win = me
+            self.game_inst.win = winner
             self.game_inst.alive = False
             self.game_inst.save()
-            # Cannot request draw if the move checkmates the opponent
+            # Cannot request draw if the game is over
             self.group_send(GroupMsgs.g_move(move=move, draw_requested=False))
-            self.group_send(GroupMsgs.g_game_end(winner=me, out_of_time=False))
-        # Forced draw
-        elif self.engine.stalemate():
+            self.group_send(GroupMsgs.g_game_end(winner=winner, out_of_time=False))
+        # Forced draw (repetition and fifty-move rule too, unless players have to claim them)
+        elif status.stalemate or endgame == 'draw' or self.engine.insufficient_material() or \
+                (settings.CHESS_AUTO_DRAW and self.draw_by_rule()):
             self.game_inst.win = "draw"
             self.game_inst.end = datetime.now()
             self.game_inst.alive = False
@@ -144,6 +176,9 @@ class ChessGameConsumer(JsonWebsocketConsumer):
         else:
             self.group_send(GroupMsgs.g_move(move=move, draw_requested=request_draw))
             run_timer(self.game_inst.id, move_count=len(self.game_inst.history), winning_player=me)
+            opponent = self.game_inst.black if self.is_first_player else self.game_inst.white
+            if is_bot(opponent):
+                request_bot_move(self.game_inst.id, self.game_inst.fen, self.game_inst.history)
 
     def __draw_accept(self):
         if not self.myturn():
@@ -156,6 +191,17 @@ class ChessGameConsumer(JsonWebsocketConsumer):
         self.game_inst.save()
         self.group_send(GroupMsgs.g_game_end(winner="draw", out_of_time=False))
 
+    def __draw_claim(self):
+        if not self.myturn():
+            return
+        if not self.draw_by_rule():
+            return
+        self.game_inst.win = "draw"
+        self.game_inst.end = datetime.now()
+        self.game_inst.alive = False
+        self.game_inst.save()
+        self.group_send(GroupMsgs.g_game_end(winner="draw", out_of_time=False))
+
     def __status_prompt(self):
         white = self.game_inst.white.username
         black_user = self.game_inst.black
@@ -175,6 +221,13 @@ class ChessGameConsumer(JsonWebsocketConsumer):
             "moves": self.game_inst.history
         }))
 
+    def draw_by_rule(self):
+        """
+        :return: True if the current position can be declared a draw by threefold repetition or by
+        the fifty-move rule
+        """
+        return self.engine.is_threefold() or self.engine.is_fifty_move()
+
     def myturn(self):
         """
         Helper to determine if I am a player and it is now my turn (and if game is not over)
@@ -196,6 +249,20 @@ class ChessGameConsumer(JsonWebsocketConsumer):
         except KeyError:
             return
 
+        if Game.counters is None:
+            return self.__dispatch(msg_type, event)
+        start = time.perf_counter()
+        self.__dispatch(msg_type, event)
+        seconds = time.perf_counter() - start
+        if seconds >= settings.CHESS_ENGINE_SLOW_SECONDS:
+            # Engine figures of this worker process so far, to tell engine work from other delays
+            logger.warning('Slow %r message in game %s: %.3f s. Engine stats: %r',
+                           msg_type, self.game_inst.id, seconds, Game.stats())
+
+    def __dispatch(self, msg_type, event):
+        """
+        Handles a client message of type `msg_type`
+        """
         if msg_type == 'move':
             try:
                 move = event['move']
@@ -205,6 +272,8 @@ class ChessGameConsumer(JsonWebsocketConsumer):
             self.__move(move, request_draw)
         elif msg_type == "draw_accept":
             self.__draw_accept()
+        elif msg_type == "draw_claim":
+            self.__draw_claim()
         elif msg_type == "status_prompt":
             self.__status_prompt()
 
@@ -232,6 +301,9 @@ class ChessGameConsumer(JsonWebsocketConsumer):
 
         self.game_inst.refresh_from_db()
 
-        while oldmoves_length < len(self.game_inst.history):
-            self.engine.make(self.game_inst.history[oldmoves_length])
-            oldmoves_length += 1
+        # Usually the opponent has just moved (a move its consumer already validated). Otherwise,
+        # restore from the snapshot
+        if len(self.game_inst.history) == oldmoves_length + 1:
+            self.engine.make_unchecked(self.game_inst.history[-1])
+        elif len(self.game_inst.history) != oldmoves_length:
+            self.reset_engine()
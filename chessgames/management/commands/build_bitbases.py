@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chessgames.common.bitbases import TABLES, build
+
+
+class Command(BaseCommand):
+    help = 'Builds the endgame bitbases (KQK, KRK, KPK and KBNK) probed by Game.probe_endgame. ' \
+           'KBNK takes much longer than the others'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default=settings.CHESS_BITBASE_DIR,
+                            help='Directory the tables are written to (default: CHESS_BITBASE_DIR)')
+        parser.add_argument('--table', action='append', dest='tables', default=[],
+                            choices=[name for name, letters in TABLES],
+                            help='Build only the named table and the ones it needs (may be repeated)')
+
+    def handle(self, *args, **options):
+        start = [time.perf_counter()]
+
+        def progress(name, table):
+            wins = sum(bin(byte).count('1') for byte in table)
+            self.stdout.write('%s: %d bytes, %d won positions (%.1f s)' % (
+                name, len(table), wins, time.perf_counter() - start[0]))
+            start[0] = time.perf_counter()
+
+        build(options['directory'], options['tables'] or None, progress)
+        self.stdout.write('Tables written to ' + options['directory'])
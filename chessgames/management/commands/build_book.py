@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chessgames.common.book import compile_book, write_book
+from chessgames.models import ChessGame
+
+
+class Command(BaseCommand):
+    help = 'Builds the opening book used by the opening explorer and the computer opponent from the ' \
+           'stored games. A running server switches to the new book on its next lookup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.CHESS_BOOK_PATH,
+                            help='Book file to write (default: CHESS_BOOK_PATH)')
+        parser.add_argument('--max-ply', type=int, default=20,
+                            help='Moves (plies) read from the start of each game (default: 20)')
+        parser.add_argument('--min-games', type=int, default=2,
+                            help='Games a move must have been played in to enter the book (default: 2)')
+
+    def handle(self, *args, **options):
+        if options['max_ply'] < 1:
+            raise CommandError('--max-ply must be at least 1')
+        if options['min_games'] < 1:
+            raise CommandError('--min-games must be at least 1')
+        start = time.perf_counter()
+        games = ChessGame.objects.exclude(history=[]).order_by('id') \
+            .values_list('history', 'win').iterator()
+        entries = compile_book(games, options['max_ply'])
+        records = write_book(entries, options['output'], options['min_games'])
+        self.stdout.write('Records: %d (of %d moves seen)' % (records, len(entries)))
+        seconds = time.perf_counter() - start
+        self.stdout.write('Book written to %s in %.1f s' % (options['output'], seconds))
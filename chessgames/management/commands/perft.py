@@ -0,0 +1,112 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chessgames.common.chessengine import Game
+from chessgames.common.perft import PERFT_SUITE, PerftPosition, run_suite
+
+
+class Command(BaseCommand):
+    help = 'Runs the chess engine perft suite, reporting node counts, nodes/sec and wall time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--depth', type=int, default=3, help='perft depth in plies (default: 3)')
+        parser.add_argument('--backend', default='mailbox', choices=sorted(Game.BACKENDS.keys()),
+                            help='Board backend used by the engine (default: mailbox)')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes the root moves are split across (default: 1)')
+        parser.add_argument('--position', action='append', dest='positions', default=[],
+                            choices=[position.name for position in PERFT_SUITE],
+                            help='Run only the named suite position (may be repeated)')
+        parser.add_argument('--fen', help='Run a custom position instead of the suite')
+        parser.add_argument('--divide', action='store_true',
+                            help='Print the node count below each root move (single position only)')
+        parser.add_argument('--format', default='table', choices=('table', 'json'),
+                            help='Output format (default: table)')
+
+    def handle(self, *args, **options):
+        depth = options['depth']
+        if depth < 1:
+            raise CommandError('--depth must be at least 1')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        if options['fen']:
+            positions = [PerftPosition('custom', options['fen'], ())]
+        elif options['positions']:
+            positions = [position for position in PERFT_SUITE
+                         if position.name in options['positions']]
+        else:
+            positions = list(PERFT_SUITE)
+
+        if options['divide']:
+            if len(positions) != 1:
+                raise CommandError('--divide needs exactly one position (use --position or --fen)')
+            return self.divide(positions[0], depth, options['backend'], options['format'],
+                               options['workers'])
+
+        results = run_suite(depth, positions, options['backend'], options['workers'])
+        if options['format'] == 'json':
+            self.stdout.write(json.dumps(self.to_json(results, options['backend']), indent=2))
+        else:
+            self.write_table(results, options['backend'])
+
+        failed = [result.name for result in results
+                  if result.expected is not None and result.nodes != result.expected]
+        if failed:
+            raise CommandError('perft mismatch on: ' + ', '.join(failed))
+
+    def divide(self, position, depth, backend, output_format, workers):
+        counts = Game.from_fen(position.fen, backend=backend).divide(depth, workers)
+        if output_format == 'json':
+            self.stdout.write(json.dumps({'fen': position.fen, 'depth': depth, 'moves': counts,
+                                          'nodes': sum(counts.values())}, indent=2, sort_keys=True))
+            return
+        for move in sorted(counts):
+            self.stdout.write('%s: %d' % (move, counts[move]))
+        self.stdout.write('')
+        self.stdout.write('Moves: %d' % len(counts))
+        self.stdout.write('Nodes: %d' % sum(counts.values()))
+
+    @staticmethod
+    def to_json(results, backend):
+        nodes = sum(result.nodes for result in results)
+        seconds = sum(result.seconds for result in results)
+        return {
+            'backend': backend,
+            'results': [{
+                'name': result.name,
+                'fen': result.fen,
+                'depth': result.depth,
+                'nodes': result.nodes,
+                'expected': result.expected,
+                'ok': result.expected is None or result.nodes == result.expected,
+                'seconds': result.seconds,
+                'nps': result.nps
+            } for result in results],
+            'total': {
+                'nodes': nodes,
+                'seconds': seconds,
+                'nps': nodes / seconds if seconds > 0 else 0.0
+            }
+        }
+
+    def write_table(self, results, backend):
+        row = '%-22s %5s %12s %12s %10s %12s  %s'
+        self.stdout.write('backend: ' + backend)
+        self.stdout.write(row % ('position', 'depth', 'nodes', 'expected', 'time (s)', 'nodes/s',
+                                 'status'))
+        for result in results:
+            if result.expected is None:
+                status = '?'
+            elif result.nodes == result.expected:
+                status = self.style.SUCCESS('ok')
+            else:
+                status = self.style.ERROR('FAIL')
+            self.stdout.write(row % (
+                result.name, result.depth, result.nodes,
+                '-' if result.expected is None else result.expected,
+                '%.3f' % result.seconds, '%.0f' % result.nps, status))
+        total = self.to_json(results, backend)['total']
+        self.stdout.write(row % ('total', '', total['nodes'], '', '%.3f' % total['seconds'],
+                                 '%.0f' % total['nps'], ''))
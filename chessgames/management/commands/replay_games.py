@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chessgames.common.batch import replay_games
+from chessgames.models import ChessGame
+
+
+class Command(BaseCommand):
+    help = 'Replays every stored game in batches, reporting games with illegal moves'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Games replayed together (default: 1000)')
+        parser.add_argument('--update-fen', action='store_true',
+                            help='Store the final position of every fully legal game in ChessGame.fen')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+        games = ChessGame.objects.order_by('id').values_list('id', 'history').iterator()
+        total = illegal = updated = 0
+        batch = []
+        for game in games:
+            batch.append(game)
+            if len(batch) == batch_size:
+                counts = self.replay(batch, options['update_fen'])
+                illegal, updated = illegal + counts[0], updated + counts[1]
+                total += len(batch)
+                batch = []
+        if batch:
+            counts = self.replay(batch, options['update_fen'])
+            illegal, updated = illegal + counts[0], updated + counts[1]
+            total += len(batch)
+
+        self.stdout.write('Games: %d' % total)
+        self.stdout.write('Illegal: %d' % illegal)
+        if options['update_fen']:
+            self.stdout.write('FEN updated: %d' % updated)
+
+    def replay(self, batch, update_fen):
+        """
+        :return: Tuple (games with an illegal move, games whose FEN was updated)
+        """
+        illegal = updated = 0
+        try:
+            results = replay_games([history for _, history in batch])
+        except ImportError as error:
+            raise CommandError(str(error))
+        for (game_id, history), result in zip(batch, results):
+            if result.illegal_ply is not None:
+                illegal += 1
+                self.stdout.write(self.style.ERROR('game %d: illegal move %r at ply %d' % (
+                    game_id, history[result.illegal_ply], result.illegal_ply)))
+            elif update_fen:
+                updated += ChessGame.objects.filter(id=game_id).update(fen=result.fen)
+        return illegal, updated
@@ -0,0 +1,18 @@
+# Generated by Django 2.0.5 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chessgames', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chessgame',
+            name='fen',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
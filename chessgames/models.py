@@ -17,6 +17,8 @@ class ChessGame(models.Model):
     end = models.DateTimeField(blank=True, null=True)
     win = models.CharField(max_length=10, blank=True)
     alive = models.BooleanField(default=False)
+    "FEN of the position after the last move in history. Empty for games saved before it existed"
+    fen = models.TextField(blank=True, default='')
 
 
 class GameSession(models.Model):
@@ -8,5 +8,6 @@ urlpatterns = [
     # path('', views.index, name='index'),  # Debugging only
     path('play/', views.play, name='play'),
     path('play/<game_id>', views.play_game_id, name="play_game_id"),
-    path('host_game', views.host_game, name="host_game")
+    path('host_game', views.host_game, name="host_game"),
+    path('explorer', views.opening_explorer, name="opening_explorer")
 ]
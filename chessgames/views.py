@@ -1,4 +1,7 @@
 from chessgames.models import ChessGame
+from chessgames.common.book import open_book
+from chessgames.common.chessengine import Game
+from chessgames.common.bot import get_bot_user, request_bot_move
 from chessgames.common.group_msgs import GroupMsgs, group_send
 from chessgames.common.move_timer import run_timer
 from chatchannels.views import create_channel
@@ -28,7 +31,9 @@ def host_game(request):
         Creates a game session in DB and returns its id.
         The stored game session is maintained for only 60 seconds. At the end of this period,
         if no opponent appeared (i.e. session.ready==False), the record is deleted from DB along
-        with its ChessGame and ChatChannel
+        with its ChessGame and ChatChannel.
+        If the POST has 'bot' set to 'white' or 'black', the computer opponent takes that seat and
+        the game starts right away
     """
     if request.method != 'POST':
         return JsonResponse({"game_id": None})
@@ -36,14 +41,29 @@ def host_game(request):
     if not request.user.is_authenticated:
         return JsonResponse({"game_id": None})
 
+    bot_side = request.POST.get('bot')
+    if bot_side not in (None, 'white', 'black'):
+        return JsonResponse({"game_id": None})
+
     channel = create_channel(admins=[request.user], is_public=True)
-    game = ChessGame(history=[], white=request.user)
+    if bot_side is None:
+        game = ChessGame(history=[], white=request.user)
+    elif bot_side == 'white':
+        game = ChessGame(history=[], white=get_bot_user(), black=request.user, alive=True)
+    else:
+        game = ChessGame(history=[], white=request.user, black=get_bot_user(), alive=True)
     channel.save()
     game.save()
-    session = GameSession(channel=channel, chess_game=game)
+    session = GameSession(channel=channel, chess_game=game, ready=bot_side is not None)
     session.save()
 
-    Timer(60.0, __delete_game_session_after_timeout, args=[session.id]).start()
+    if bot_side is None:
+        Timer(60.0, __delete_game_session_after_timeout, args=[session.id]).start()
+    else:
+        # White has a fixed time to move. Else, black wins
+        run_timer(game.id, move_count=0, winning_player='black')
+        if bot_side == 'white':
+            request_bot_move(game.id, Game.default_game().to_fen(), history=[])
 
     return JsonResponse({"game_id": session.id})
 
@@ -131,3 +151,22 @@ def play_game_id(request, game_id):
             opponent=request.user.username))
 
         return JsonResponse({"game_id": session.id})
+
+
+def opening_explorer(request):
+    """
+    GET with authentication:
+        Returns the moves of the opening book (see `manage.py build_book`) for the position given in
+        FEN by 'fen' (the initial position if absent): for each move, the games in which it was played
+        and how those that ended went for the player who made it.
+        'moves' is None if the FEN is not valid
+    """
+    fen = request.GET.get('fen', Game.default_game().to_fen())
+    if not request.user.is_authenticated:
+        return JsonResponse({"fen": fen, "moves": None})
+    try:
+        key = Game.from_fen(fen).hash()
+    except (ValueError, KeyError):
+        return JsonResponse({"fen": fen, "moves": None})
+    moves = open_book(settings.CHESS_BOOK_PATH).lookup(key)
+    return JsonResponse({"fen": fen, "moves": [move._asdict() for move in moves]})
@@ -107,6 +107,37 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Chess engine
+
+# Approximate memory cap (in bytes) of each worker process' cache of legal move lists
+# (see chessgames.common.chessengine.MoveCache). 0 disables the cache
+CHESS_MOVE_CACHE_BYTES = int(os.environ.get('CHESS_MOVE_CACHE_BYTES', 32 * 1024 * 1024))
+
+# Computer opponent (see chessgames.common.bot): username of its User, search time per move
+# (seconds, waiting for a free worker included) and size of the process pool that runs the searches
+CHESS_BOT_USERNAME = os.environ.get('CHESS_BOT_USERNAME', 'bot')
+CHESS_BOT_MOVE_SECONDS = float(os.environ.get('CHESS_BOT_MOVE_SECONDS', 2.0))
+CHESS_BOT_WORKERS = int(os.environ.get('CHESS_BOT_WORKERS', os.cpu_count() or 1))
+
+# Whether threefold repetition and the fifty-move rule end a game as a draw at once. Otherwise, the
+# player to move has to claim the draw (see chessgames/README.md)
+CHESS_AUTO_DRAW = True if os.environ.get('CHESS_AUTO_DRAW', 'True') == 'True' else False
+
+# Directory of the endgame bitbases written by `manage.py build_bitbases`, and whether the endings they
+# cover end the game at once with their result
+CHESS_BITBASE_DIR = os.environ.get('CHESS_BITBASE_DIR', os.path.join(BASE_DIR, 'bitbases'))
+CHESS_ADJUDICATE_ENDGAMES = \
+    True if os.environ.get('CHESS_ADJUDICATE_ENDGAMES', 'True') == 'True' else False
+
+# Opening book written by `manage.py build_book` from the stored games, used by the opening explorer
+# and the computer opponent
+CHESS_BOOK_PATH = os.environ.get('CHESS_BOOK_PATH', os.path.join(BASE_DIR, 'book', 'openings.book'))
+
+# Whether each worker process counts the engine's work and times its main calls (see Game.stats), and
+# the handling time (seconds) from which a websocket message is logged along with those figures
+CHESS_ENGINE_STATS = True if os.environ.get('CHESS_ENGINE_STATS', 'False') == 'True' else False
+CHESS_ENGINE_SLOW_SECONDS = float(os.environ.get('CHESS_ENGINE_SLOW_SECONDS', 0.25))
+
 # Database
 # https://docs.djangoproject.com/en/2.0/ref/settings/#databases
 